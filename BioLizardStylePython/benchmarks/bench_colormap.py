@@ -0,0 +1,54 @@
+"""
+Colormap application benchmark for BioLizardStylePython.
+
+Colors a random float32 and uint16 image with `l_viridis_pal` through matplotlib
+(`cmap(norm(data))` as float64 RGBA and with bytes=True) and through
+`apply_colormap` (uint8 lookup table), and reports time and output size.
+Run from the package root:
+
+    python benchmarks/bench_colormap.py [--size 8192] [--repeat 3]
+"""
+import argparse
+import time
+import numpy as np
+import matplotlib
+import matplotlib.colors
+from BioLizardStylePython import apply_colormap
+
+
+def best_time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=8192, help='image side in pixels')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per scenario, the fastest counts')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    cmap = matplotlib.colormaps['l_viridis_pal']
+    images = {
+        'float32': (rng.normal(size=(args.size, args.size)).astype(np.float32), -3, 3),
+        'uint16': (rng.integers(0, 4096, size=(args.size, args.size), dtype=np.uint16), 0, 4095),
+    }
+    print(f"{'scenario (' + str(args.size) + 'x' + str(args.size) + ')':<42} {'time (s)':>9} {'output (MiB)':>13}")
+    for dtype, (data, vmin, vmax) in images.items():
+        norm = matplotlib.colors.Normalize(vmin, vmax)
+        scenarios = {
+            f'{dtype}: cmap(norm(data))': lambda: cmap(norm(data)),
+            f'{dtype}: cmap(norm(data), bytes=True)': lambda: cmap(norm(data), bytes=True),
+            f'{dtype}: apply_colormap': lambda: apply_colormap(data, cmap, vmin=vmin, vmax=vmax),
+        }
+        for name, function in scenarios.items():
+            seconds, nbytes = best_time(function, args.repeat)
+            print(f"{name:<42} {seconds:>9.2f} {nbytes / 2 ** 20:>13.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Output encoding benchmark for BioLizardStylePython.
+
+Renders a finalised example figure (lines, bars and a heatmap in the lizard
+palettes) once, then encodes it with every bitmap output option of
+`finalise_lizardplot` and reports encode time, file size and the mean
+absolute pixel error of the decoded result. Run from the package root:
+
+    python benchmarks/bench_encode.py [--repeat 3]
+"""
+import argparse
+import io
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from PIL import Image, features
+from BioLizardStylePython import finalise_lizardplot, lizard_style, biolizard_qualitative_pal
+from BioLizardStylePython.utils import _save_raster
+
+OPTIONS = {
+    'PNG (default, level 6)': {},
+    'PNG level 1': {'compress_level': 1},
+    'PNG level 9 + optimize': {'compress_level': 9, 'optimize': True},
+    'PNG indexed 256': {'palette_colors': 256},
+    'PNG indexed 256 + optimize': {'palette_colors': 256, 'optimize': True},
+    'PNG indexed 64': {'palette_colors': 64},
+    'WebP lossless': {'image_format': 'webp'},
+    'WebP lossless + optimize': {'image_format': 'webp', 'optimize': True},
+    'WebP quality 90': {'image_format': 'webp', 'quality': 90},
+    'AVIF (default quality)': {'image_format': 'avif'},
+}
+
+
+def example_image():
+    lizard_style()
+    rng = np.random.default_rng(0)
+    fig, axes = plt.subplots(1, 3, figsize=(14, 4))
+    for i in range(5):
+        axes[0].plot(np.cumsum(rng.normal(size=200)), label=f'gene {i}')
+    axes[0].legend()
+    axes[1].bar(list('abcdef'), rng.uniform(1, 5, 6), color=biolizard_qualitative_pal.colors[:6])
+    axes[2].imshow(rng.normal(size=(40, 40)).cumsum(axis=0), cmap='biolizard_sequential_pal')
+    image = finalise_lizardplot(fig, "Source: BioLizard benchmark", return_as='image')
+    plt.close(fig)
+    return image
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=3, help='encodes per option, the fastest counts')
+    args = parser.parse_args()
+
+    image = example_image()
+    reference = np.asarray(image, dtype=int)
+    print(f"{'option (' + 'x'.join(map(str, image.size)) + ' px)':<30} {'encode (s)':>10} {'size (kB)':>10} {'error':>7}")
+    for name, options in OPTIONS.items():
+        if options.get('image_format') in ('webp', 'avif') and not features.check(options['image_format']):
+            print(f"{name:<30} {'not supported by this Pillow':>29}")
+            continue
+        timings = []
+        for _ in range(args.repeat):
+            buf = io.BytesIO()
+            start = time.perf_counter()
+            _save_raster(image, buf, False, **options)
+            timings.append(time.perf_counter() - start)
+        decoded = np.asarray(Image.open(io.BytesIO(buf.getvalue())).convert('RGB'), dtype=int)
+        error = np.abs(decoded - reference).mean()
+        print(f"{name:<30} {min(timings):>10.3f} {buf.tell() / 1024:>10.1f} {error:>7.3f}")
+
+
+if __name__ == '__main__':
+    main()
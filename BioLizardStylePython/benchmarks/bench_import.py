@@ -0,0 +1,71 @@
+"""
+Startup benchmark for BioLizardStylePython.
+
+Every measurement runs in a fresh interpreter so module caches do not leak
+between runs. With --cold, every run also gets an empty matplotlib config and
+cache directory (MPLCONFIGDIR), like a fresh container: matplotlib rebuilds its
+font list, the Lato fonts are registered and the palette cache is rebuilt.
+Run from the package root:
+
+    python benchmarks/bench_import.py [--repeat 7] [--cold]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SCENARIOS = {
+    'import matplotlib.pyplot (reference)': "import matplotlib.pyplot",
+    'Lato via fonts.ttf + addfont (reference)': ("from matplotlib import font_manager; from fonts.ttf import Lato, LatoBold; "
+                                                  "font_manager.fontManager.addfont(Lato); "
+                                                  "font_manager.fontManager.addfont(LatoBold)"),
+    'import BioLizardStylePython': "import BioLizardStylePython",
+    'import + lizard_style()': "import BioLizardStylePython as b; b.lizard_style()",
+    'import + lizard_style(plotly=True)': "import BioLizardStylePython as b; b.lizard_style(plotly=True)",
+    'import + lizard_style_template': "import BioLizardStylePython as b; b.lizard_style_template",
+}
+
+TIMER = """
+import time
+_start = time.perf_counter()
+{statement}
+print(time.perf_counter() - _start)
+"""
+
+
+def time_statement(statement, repeat, cold=False):
+    timings = []
+    for _ in range(repeat):
+        env = dict(os.environ)
+        if cold:
+            env['MPLCONFIGDIR'] = tempfile.mkdtemp(prefix='bench_mpl_')
+        try:
+            out = subprocess.run([sys.executable, '-c', TIMER.format(statement=statement)],
+                                 check=True, capture_output=True, text=True, env=env).stdout
+        finally:
+            if cold:
+                shutil.rmtree(env['MPLCONFIGDIR'], ignore_errors=True)
+        timings.append(float(out.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=7, help='fresh interpreters per scenario')
+    parser.add_argument('--cold', action='store_true', help='empty matplotlib cache directory for every run')
+    args = parser.parse_args()
+
+    # warm the OS file cache and matplotlib's font cache first
+    time_statement(SCENARIOS['import BioLizardStylePython'], 1)
+
+    print(f"{'scenario (' + ('cold' if args.cold else 'warm') + ')':<42} {'median (ms)':>12} {'min (ms)':>10}")
+    for name, statement in SCENARIOS.items():
+        timings = time_statement(statement, args.repeat, cold=args.cold)
+        print(f"{name:<42} {statistics.median(timings) * 1e3:>12.1f} {min(timings) * 1e3:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
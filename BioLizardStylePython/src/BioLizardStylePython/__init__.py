@@ -1,9 +1,4 @@
-# check if colorspace installed
-try:
-    import colorspace
-except ModuleNotFoundError:
-    print('Could not find colorspace module. Install with `pip install git+https://github.com/retostauffer/python-colorspace.git`')
-    raise
+import importlib as _importlib  # private name, so star imports do not leak it
 
 # clear matplotlib cache to make sure lato font is recognized
 import matplotlib as mpl
@@ -34,12 +29,44 @@ import matplotlib as mpl
 # else:
 #     lato_localname = font_names.pop()  #pick first one, usually there should only be one.. (?)
 
-from matplotlib import font_manager
-from fonts.ttf import Lato, LatoBold
-font_manager.fontManager.addfont(Lato)  #  adds a custom font from a file without installing it into the operating system
-font_manager.fontManager.addfont(LatoBold)
+from ._fonts import register_fonts, lato_family
+register_fonts()  # once per environment, skipped when matplotlib's font cache already has Lato
 # prop = font_manager.FontProperties(fname=Lato)
 # lato_localname = prop.get_name()
 
 from .utils import *
-from .plotly_template import *
\ No newline at end of file
+from .footer import *
+from .batch import *
+from .density import *
+from .colorize import *
+from .heatmap import *
+from .report import *
+
+# The plotly template is only built when it is first needed: on access of one of the
+# names below (also through `from BioLizardStylePython import *`), on
+# `lizard_style(plotly=True)` or `lizard_style_context(plotly=True)`, or by the plotly
+# helpers, which all register it as "lizard_style" with plotly.io.
+# A plain `import BioLizardStylePython` for matplotlib-only jobs never imports plotly.
+_LAZY_ATTRIBUTES = {
+    'lizard_style_template': 'plotly_template',
+    'set_colorscale_tolerance': 'plotly_template',
+    'optimize_for_webgl': 'plotly_utils',
+    'lttb': 'plotly_utils',
+    'lizard_heatmap': 'plotly_utils',
+}
+
+__all__ = (utils.__all__ + footer.__all__ + batch.__all__ + density.__all__ + colorize.__all__ + heatmap.__all__
+           + report.__all__ + ['mpl', 'register_fonts', 'lato_family'] + list(_LAZY_ATTRIBUTES))
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = _importlib.import_module('.' + _LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,66 @@
+"""
+Registration of the Lato fonts with matplotlib.
+
+The font files are located directly in the `font_lato` package instead of through
+`fonts.ttf`, which scans the entry points of every installed distribution. They are
+only added to matplotlib's font manager when it does not know them yet, and the font
+manager is then saved to matplotlib's own font cache, so registration runs once per
+environment: later imports find Lato in the cache.
+"""
+import os
+import importlib.util
+from functools import lru_cache
+import matplotlib as mpl
+from matplotlib import font_manager
+
+# files of the font_lato package registered with matplotlib, regular and bold
+_LATO_FILES = ('Lato-Regular.ttf', 'Lato-Bold.ttf')
+
+
+def _lato_paths():
+    spec = importlib.util.find_spec('font_lato')
+    if spec is not None and spec.submodule_search_locations:
+        directory = os.path.join(list(spec.submodule_search_locations)[0], 'files')
+        paths = [os.path.join(directory, name) for name in _LATO_FILES]
+        if all(os.path.isfile(path) for path in paths):
+            return paths
+    from fonts.ttf import Lato, LatoBold  # other installations of the fonts packages
+    return [Lato, LatoBold]
+
+
+def _normpath(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+@lru_cache(maxsize=None)
+def register_fonts():
+    """
+    Make the Lato fonts available to matplotlib, once per process and environment.
+
+    Fonts already known to matplotlib's font manager (e.g. from its font cache) are skipped.
+    Newly added fonts are written to matplotlib's font cache.
+
+    Returns:
+    list of str: paths of the Lato font files.
+    """
+    paths = _lato_paths()
+    known = {_normpath(font.fname) for font in font_manager.fontManager.ttflist}
+    missing = [path for path in paths if _normpath(path) not in known]
+    for path in missing:
+        font_manager.fontManager.addfont(path)  # adds a custom font from a file without installing it into the operating system
+    if missing:
+        cache = os.path.join(mpl.get_cachedir(), f'fontlist-v{font_manager.FontManager.__version__}.json')
+        font_manager.json_dump(font_manager.fontManager, cache)
+    return paths
+
+
+@lru_cache(maxsize=None)
+def lato_family():
+    """
+    The family name matplotlib uses for the registered Lato font, resolved once per process.
+    """
+    regular = _normpath(register_fonts()[0])
+    for font in font_manager.fontManager.ttflist:
+        if _normpath(font.fname) == regular:
+            return font.name
+    return font_manager.FontProperties(fname=register_fonts()[0]).get_name()
@@ -0,0 +1,329 @@
+"""
+Internal palette layer.
+
+Every continuous palette is held as one NumPy RGB array (`_Palette`). The matplotlib
+colormaps, plotly colorscales and hex lists are derived from that array with vectorized
+conversions and memoized, so all consumers share a single object per representation.
+
+The colormaps exported by the package (`lazy_colormap`) are ordinary
+`LinearSegmentedColormap` objects whose segment data is only computed when the
+colormap is first used, so importing the package does not build any palette.
+
+The HCL palettes are generated with `colorspace` only once: the resulting uint8 RGB
+tables are stored in a versioned `.npz` file in matplotlib's cache directory, so
+later imports (and every spawned worker process) build the colormaps straight from
+the stored arrays without importing `colorspace`.
+"""
+import os
+import hashlib
+import tempfile
+from collections.abc import Mapping
+from functools import lru_cache, cached_property
+import numpy as np
+import matplotlib as mpl
+import matplotlib.colors
+
+_N_COLORS = 256
+
+# name: (colorspace palette, keyword arguments)
+# The repr of this table is part of the cache key: changing a palette invalidates the cache.
+_HCL_PALETTES = {
+    # 330 degrees instead of 360 to avoid the last being identical to the first one
+    'biolizard_hues_pal': ('qualitative_hcl',
+                           {'h': [151.6, 330 * (_N_COLORS - 1) / _N_COLORS + 151.6], 'c': 49.5, 'l': 58.9}),
+    'biolizard_sequential_pal': ('sequential_hcl',
+                                 {'h': 170, 'c': [0, 75, 40], 'l': [90, 35], 'power': 1}),
+    'biolizard_divergent_pal': ('diverging_hcl',
+                                {'h': [60, 170], 'c': 80, 'l': [50, 95], 'power': 1}),
+}
+
+# (palette, reversed, n, ΔE): indices of the compact colorscale stops, see `compact_stops`.
+# Precomputed for the default tolerance of the plotly template, so building it needs no search;
+# tests/test_palettes.py re-derives them. Other tolerances are searched and cached on disk.
+_COMPACT_STOPS = {
+    ('biolizard_sequential_pal', False, 255, 1.0): (0, 64, 102, 128, 171, 254),
+    ('biolizard_sequential_pal', True, 255, 1.0): (0, 79, 126, 151, 182, 254),
+    ('biolizard_divergent_pal', False, 255, 1.0): (0, 19, 23, 30, 47, 77, 128, 178, 201, 216, 254),
+    ('biolizard_divergent_pal', True, 255, 1.0): (0, 37, 53, 74, 127, 158, 202, 223, 232, 236, 254),
+    ('l_viridis_pal', False, 255, 1.0): (0, 25, 66, 106, 146, 200, 254),
+    ('l_viridis_pal', True, 255, 1.0): (0, 10, 84, 128, 171, 212, 254),
+}
+
+
+def _package_version():
+    from importlib.metadata import version, PackageNotFoundError
+    try:
+        return version('BioLizardStylePython')
+    except PackageNotFoundError:
+        return 'unknown'
+
+
+def _cache_path():
+    key = hashlib.sha1(repr((_N_COLORS, sorted(_HCL_PALETTES.items()))).encode()).hexdigest()[:12]
+    filename = f'hcl_palettes-{_package_version()}-{key}.npz'
+    return os.path.join(mpl.get_cachedir(), 'BioLizardStylePython', filename)
+
+
+def _build_hcl_tables():
+    """
+    Generate the HCL palettes with colorspace, as uint8 RGB arrays of shape (256, 3).
+    """
+    try:
+        import colorspace
+    except ModuleNotFoundError:
+        print('Could not find colorspace module. Install with `pip install colorspace`')
+        raise
+    tables = {}
+    for name, (palette, kwargs) in _HCL_PALETTES.items():
+        colors = getattr(colorspace, palette)(**kwargs)(_N_COLORS)
+        rgb = np.array([matplotlib.colors.to_rgb(color) for color in colors])
+        tables[name] = np.round(rgb * 255).astype(np.uint8)
+    return tables
+
+
+def _write_cache(path, tables):
+    """
+    Atomically write the tables, so concurrent first imports never read a partial file.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npz')
+        with os.fdopen(fd, 'wb') as fh:
+            np.savez(fh, **tables)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # read-only cache dir: fall back to rebuilding on every import
+
+
+@lru_cache(maxsize=None)
+def hcl_tables():
+    """
+    Return the HCL palette tables, from the on-disk cache when available.
+
+    Returns:
+    dict mapping palette name to a uint8 array of shape (256, 3).
+    """
+    path = _cache_path()
+    try:
+        with np.load(path) as data:
+            return {name: data[name] for name in _HCL_PALETTES}
+    except (OSError, KeyError, ValueError):
+        pass
+    tables = _build_hcl_tables()
+    _write_cache(path, tables)
+    return tables
+
+
+# sRGB (D65) to CIE XYZ, divided by the D65 white point
+_SRGB_TO_XYZ = (np.array([[0.4124564, 0.3575761, 0.1804375],
+                          [0.2126729, 0.7151522, 0.0721750],
+                          [0.0193339, 0.1191920, 0.9503041]])
+                / np.array([0.95047, 1.0, 1.08883])[:, None]).T.astype(np.float32)
+
+
+def _srgb_to_lab(rgb):
+    """
+    Convert float sRGB colors in [0, 1], shape (..., 3), to CIELAB (D65), in float32.
+    """
+    rgb = np.asarray(rgb, dtype=np.float32)
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _SRGB_TO_XYZ
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+def _colorscale_positions(n):
+    """Positions of `n` evenly spaced colorscale stops, rounded to keep the JSON short."""
+    return np.round(np.arange(n) / (n - 1), 4)
+
+
+def compact_stops(colors, delta_e=1.0):
+    """
+    Fewest colorscale stops that reproduce a dense colorscale within a perceptual tolerance.
+
+    Plotly interpolates linearly in sRGB between stops. A stop can be placed at every
+    color of `colors`; the chosen stops are those of the shortest chain from the first to
+    the last color where, on every segment, the interpolation of the 8-bit stop colors stays
+    within `delta_e` (CIE76 ΔE in CIELAB) of all colors in between.
+
+    Parameters:
+    - colors (array-like): float RGB(A) colors in [0, 1], shape (n, 3) or (n, 4), evenly spaced.
+    - delta_e (float, optional): Maximum ΔE between the compacted and the dense colorscale. Defaults to 1.0,
+      below the just noticeable difference of about 2.3.
+
+    Returns:
+    numpy.ndarray of the indices in `colors` of the stops, including the first and the last.
+    """
+    reference = np.asarray(colors, dtype=float)[:, :3]
+    n = len(reference)
+    x = np.arange(n) / (n - 1)
+    positions = _colorscale_positions(n)
+    stops = (np.round(reference * 255) / 255).astype(np.float32)  # the hex colors plotly receives
+    target = _srgb_to_lab(reference)
+    # shortest path over the segments within tolerance, every color is a possible stop
+    count = np.full(n, n)
+    count[0] = 0
+    previous = np.zeros(n, dtype=int)
+    for i in range(n - 1):
+        ends = np.arange(i + 1, n)
+        between = np.arange(i, n)
+        t = np.clip((x[between][None, :] - positions[i]) / (positions[ends] - positions[i])[:, None], 0, 1)
+        interpolated = stops[i] + (stops[ends] - stops[i])[:, None, :] * t[..., None].astype(np.float32)
+        error = ((_srgb_to_lab(interpolated) - target[between][None]) ** 2).sum(axis=-1)
+        error[between[None, :] > ends[:, None]] = 0
+        feasible = error.max(axis=1) <= delta_e ** 2
+        feasible[0] = True  # neighbouring colors are always joined
+        ends = ends[feasible]
+        shorter = count[i] + 1 < count[ends]
+        count[ends[shorter]] = count[i] + 1
+        previous[ends[shorter]] = i
+    path = [n - 1]
+    while path[-1] != 0:
+        path.append(previous[path[-1]])
+    return np.array(path[::-1])
+
+
+def to_hex(colors):
+    """
+    Vectorized `matplotlib.colors.rgb2hex` for an array of float RGB(A) colors.
+
+    Parameters:
+    - colors (array-like): float colors in [0, 1], shape (n, 3) or (n, 4). Alpha is ignored.
+
+    Returns:
+    list of str: '#rrggbb' strings.
+    """
+    rgb = np.round(np.asarray(colors, dtype=float)[..., :3] * 255).astype(np.uint32)
+    packed = (rgb[..., 0] << 16) | (rgb[..., 1] << 8) | rgb[..., 2]
+    return np.char.mod('#%06x', packed).tolist()
+
+
+class _Palette:
+    """
+    A continuous palette stored as a single float RGB array of shape (n, 3).
+
+    Parameters:
+    - name (str): name of the palette, the reversed variant is named `name + '_r'`.
+    - rgb (array-like): float RGB colors in [0, 1], in palette order.
+    """
+
+    def __init__(self, name, rgb):
+        self.name = name
+        self.rgb = np.array(rgb, dtype=float)
+        self.rgb.setflags(write=False)
+
+    @property
+    def rgb8(self):
+        """The palette as uint8 RGB array."""
+        return np.round(self.rgb * 255).astype(np.uint8)
+
+    @cached_property
+    def colormap(self):
+        return matplotlib.colors.LinearSegmentedColormap.from_list(self.name, self.rgb)
+
+    @cached_property
+    def colormap_r(self):
+        return self.colormap.reversed(name=self.name + '_r')
+
+    def hex(self, reverse=False):
+        """Hex strings of the palette colors."""
+        return to_hex(self.rgb[::-1] if reverse else self.rgb)
+
+    @lru_cache(maxsize=None)
+    def colorscale(self, n=255, reverse=False, delta_e=None):
+        """
+        Plotly colorscale: hex colors of the first `n` entries of the colormap lookup table.
+
+        With `delta_e`, the colorscale is compacted to the fewest (position, color) stops that stay
+        within `delta_e` (CIE76) of the full colorscale, see `compact_stops`. The stops for the default
+        tolerance are precomputed (`_COMPACT_STOPS`); others are cached on disk next to the HCL palettes,
+        as finding them takes about half a second.
+
+        The result is memoized and shared (as a tuple) between all plotly traces using it.
+        """
+        cmap = self.colormap_r if reverse else self.colormap
+        colors = cmap(np.arange(n))
+        if delta_e is None:
+            return tuple(to_hex(colors))
+        stops = self._compact_stops(colors, delta_e, reverse)
+        positions = _colorscale_positions(n)[stops].tolist()
+        return tuple(zip(positions, to_hex(colors[stops])))
+
+    def _compact_stops(self, colors, delta_e, reverse):
+        precomputed = _COMPACT_STOPS.get((self.name, reverse, len(colors), float(delta_e)))
+        if precomputed is not None:
+            return np.array(precomputed)
+        key = hashlib.sha1(repr((self.name, reverse, float(delta_e))).encode() + colors.tobytes()).hexdigest()[:12]
+        path = os.path.join(os.path.dirname(_cache_path()), f'colorscale-{_package_version()}-{key}.npz')
+        try:
+            with np.load(path) as data:
+                return data['stops']
+        except (OSError, KeyError, ValueError):
+            pass
+        stops = compact_stops(colors, delta_e)
+        _write_cache(path, {'stops': stops})
+        return stops
+
+
+def _palette_table(name):
+    if name == 'l_viridis_pal':
+        from .l_viridis import cm_data
+        return np.asarray(cm_data)[::-1]  # cm_data starts with blue, l_viridis starts with yellow
+    return hcl_tables()[name] / 255
+
+
+@lru_cache(maxsize=None)
+def palette(name):
+    """
+    Return the shared `_Palette` of a continuous biolizard palette.
+
+    Parameters:
+    - name (str): one of 'biolizard_hues_pal', 'biolizard_sequential_pal',
+      'biolizard_divergent_pal' or 'l_viridis_pal'.
+    """
+    return _Palette(name, _palette_table(name))
+
+
+class _LazySegmentData(Mapping):
+    """
+    Segment data of a palette colormap, computed from the palette on first access.
+
+    Parameters:
+    - name (str): name of the palette, see `palette`.
+    - reverse (bool, optional): segment data of the reversed colormap. Defaults to False.
+    """
+
+    def __init__(self, name, reverse=False):
+        self.name = name
+        self.reverse = reverse
+
+    @cached_property
+    def _data(self):
+        pal = palette(self.name)
+        return (pal.colormap_r if self.reverse else pal.colormap)._segmentdata
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def lazy_colormap(name, reverse=False):
+    """
+    A colormap of a continuous biolizard palette that is only built when it is first used.
+
+    The result is a regular `matplotlib.colors.LinearSegmentedColormap`, identical to
+    `palette(name).colormap` (or `.colormap_r`) once used, and can be registered with
+    matplotlib without building it. Copies, such as the one matplotlib registers, share the
+    lazily computed data.
+
+    Parameters:
+    - name (str): name of the palette, see `palette`.
+    - reverse (bool, optional): If True, the reversed colormap, named `name + '_r'`. Defaults to False.
+    """
+    return matplotlib.colors.LinearSegmentedColormap(name + '_r' if reverse else name,
+                                                     _LazySegmentData(name, reverse), N=_N_COLORS)
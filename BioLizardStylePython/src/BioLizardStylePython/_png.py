@@ -0,0 +1,56 @@
+"""
+Minimal streaming PNG writer.
+
+Writes an RGB PNG from one or more RGB(A) arrays stacked vertically, band by band,
+so no full-size RGB copy of the image is ever made.
+"""
+import zlib
+import struct
+import numpy as np
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_FILTER_UP = 2
+
+
+def _write_chunk(fh, tag, data):
+    fh.write(struct.pack('>I', len(data)))
+    fh.write(tag)
+    fh.write(data)
+    fh.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(tag))))
+
+
+def write_png_bands(fh, parts, band_rows=256, compress_level=6):
+    """
+    Write the vertically stacked `parts` as one 8-bit RGB PNG, band by band.
+
+    Every row uses the PNG "Up" filter, computed per band with NumPy, and the bands are
+    compressed with one streaming zlib compressor. Alpha channels are dropped, like pasting
+    an RGBA image into an RGB one.
+
+    Parameters:
+    - fh (binary file-like): Where to write the PNG.
+    - parts (list of numpy.ndarray): uint8 arrays of shape (rows, width, 3 or 4), all of the same width.
+    - band_rows (int, optional): Number of rows converted and compressed at once. Defaults to 256.
+    - compress_level (int, optional): zlib compression level. Defaults to 6, like Pillow.
+    """
+    width = parts[0].shape[1]
+    height = sum(part.shape[0] for part in parts)
+    fh.write(_PNG_SIGNATURE)
+    _write_chunk(fh, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+    compressor = zlib.compressobj(compress_level)
+    rows = np.empty((band_rows, 1 + 3 * width), dtype=np.uint8)
+    rows[:, 0] = _FILTER_UP
+    previous = np.zeros((1, width, 3), dtype=np.uint8)
+    for part in parts:
+        for start in range(0, part.shape[0], band_rows):
+            band = part[start:start + band_rows, :, :3]
+            n = band.shape[0]
+            filtered = rows[:n, 1:].reshape(n, width, 3)
+            np.subtract(band[:1], previous, out=filtered[:1])
+            np.subtract(band[1:], band[:-1], out=filtered[1:])  # uint8 arithmetic wraps modulo 256
+            previous = band[-1:].copy()
+            data = compressor.compress(rows[:n])
+            if data:
+                _write_chunk(fh, b'IDAT', data)
+    _write_chunk(fh, b'IDAT', compressor.flush())
+    _write_chunk(fh, b'IEND', b'')
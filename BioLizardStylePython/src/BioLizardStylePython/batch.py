@@ -0,0 +1,195 @@
+import os
+import time
+import uuid
+import pickle
+import asyncio
+import functools
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import matplotlib
+import matplotlib.pyplot as plt
+from .utils import finalise_lizardplot
+from .footer import get_logo
+
+__all__ = ['finalise_lizardplots', 'finalise_lizardplot_async', 'set_async_workers']
+
+
+def _init_worker(rc_params, logo_path):
+    """
+    Warm a worker process once: Agg backend, the rcParams and logo of the calling process, and fonts.
+    """
+    matplotlib.use('Agg')
+    from .footer import set_logo, get_logo
+    matplotlib.rcParams.update(rc_params)  # fonts are registered when the package is imported
+    set_logo(logo_path)
+    get_logo().array
+
+
+def _worker_rc_params():
+    return {key: value for key, value in matplotlib.rcParams.items() if key != 'backend'}
+
+
+def _finalise_one(index, plot, filename, kwargs, close):
+    """
+    Finalise a single plot into `filename`, atomically. Never raises.
+    """
+    result = {'index': index, 'filename': filename, 'seconds': None, 'error': None}
+    start = time.perf_counter()
+    try:
+        if isinstance(plot, (str, os.PathLike)):
+            with open(plot, 'rb') as fh:
+                plot = pickle.load(fh)
+            close = True
+        root, ext = os.path.splitext(filename)
+        tmp_filename = f'{root}.{uuid.uuid4().hex}.tmp{ext}'  # keep the extension, it selects the format
+        try:
+            finalise_lizardplot(plot, save_filepath=tmp_filename, **kwargs)
+            os.replace(tmp_filename, filename)
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            if close:
+                plt.close(plot)
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def finalise_lizardplots(plots, source_text, fontsize=12, pdf=False, vector=False, output_dir='.', output_names=None,
+                         max_workers=None, mp_context=None, use_threads=False):
+    """
+    Finalise and save many plots in parallel.
+
+    Every plot gets the footer of `finalise_lizardplot`. The plots are spread over a pool
+    of worker processes, which are each warmed once with fonts and the rcParams (e.g. the lizard
+    style) and logo of the calling process, so plots render as they would in the calling process
+    with max_workers=1 or use_threads=True.
+    Every file is written to a temporary name first and then atomically moved in place,
+    and a failing plot does not stop the others.
+
+    Parameters:
+    - plots (list): matplotlib.figure.Figure objects, or paths to pickled figures (`pickle.dump(fig, fh)`),
+      which are then only loaded in the worker.
+    - source_text (str): The source text to be displayed at the bottom of every plot.
+    - fontsize (int, optional): Font size of the source text. Defaults to 12.
+    - pdf (bool, optional): If True, saves the outputs as PDF. Otherwise, saves as PNG. Defaults to False.
+    - vector (bool, optional): Save vector graphics, see `finalise_lizardplot`. Defaults to False.
+    - output_dir (str, optional): Directory to save the outputs in. Defaults to the current working directory.
+    - output_names (list of str, optional): Names of the output files (without extension), one per plot.
+      Defaults to "TempLizardPlot_<batch>_<index>", with a random batch id per call, so outputs never
+      overwrite each other, also across batches sharing output_dir. The 'filename' of the results gives
+      the paths.
+    - max_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+      With max_workers=1 the plots are finalised one by one in the current process.
+    - mp_context (multiprocessing context, optional): Start method of the worker processes.
+    - use_threads (bool, optional): If True, use a pool of threads in the current process instead of
+      worker processes. The figures are then not pickled, which suits many small plots, but rendering
+      only runs partly in parallel. Defaults to False.
+
+    Returns:
+    list of dict, in the order of `plots`, with keys 'index', 'filename', 'seconds' (wall time
+    of the plot in its worker) and 'error' (formatted traceback, or None on success).
+
+    Example:
+    #>>> results = finalise_lizardplots([fig1, fig2], "Source: BioLizard Data", output_dir="figures")
+    #>>> failed = [r for r in results if r['error']]
+    """
+    plots = list(plots)
+    if output_names is None:
+        batch = uuid.uuid4().hex[:8]
+        output_names = [f'TempLizardPlot_{batch}_{index}' for index in range(len(plots))]
+    if len(output_names) != len(plots):
+        raise ValueError("output_names must contain one name per plot")
+    if len(set(output_names)) != len(output_names):
+        raise ValueError("output_names must be unique")
+    extension = '.pdf' if pdf else ('.svg' if vector else '.png')
+    filenames = [os.path.join(output_dir, name + extension) for name in output_names]
+    kwargs = {'source_text': source_text, 'fontsize': fontsize, 'pdf': pdf, 'vector': vector}
+
+    if max_workers == 1:
+        return [_finalise_one(index, plot, filename, kwargs, close=False)
+                for index, (plot, filename) in enumerate(zip(plots, filenames))]
+
+    if use_threads:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_finalise_one, index, plot, filename, kwargs, False)
+                       for index, (plot, filename) in enumerate(zip(plots, filenames))]
+            return [future.result() for future in futures]
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(_worker_rc_params(), get_logo().path)) as pool:
+        futures = [pool.submit(_finalise_one, index, plot, filename, kwargs, True)
+                   for index, (plot, filename) in enumerate(zip(plots, filenames))]
+        results = []
+        for index, (future, filename) in enumerate(zip(futures, filenames)):
+            try:
+                results.append(future.result())
+            except Exception:  # e.g. the plot could not be pickled, or a worker died
+                results.append({'index': index, 'filename': filename, 'seconds': None,
+                                'error': traceback.format_exc()})
+        return results
+
+
+# Bounded thread pool shared by all `finalise_lizardplot_async` calls of the process
+_async_executor = None
+_async_executor_lock = threading.Lock()
+
+
+def _new_async_executor(max_workers):
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lizardplot')
+
+
+def set_async_workers(max_workers=None):
+    """
+    Set the number of threads `finalise_lizardplot_async` renders on.
+
+    Parameters:
+    - max_workers (int, optional): Maximum number of plots finalised at the same time.
+      Defaults to the number of CPUs (at most 8). Further calls wait for a free thread.
+    """
+    global _async_executor
+    with _async_executor_lock:
+        previous, _async_executor = _async_executor, _new_async_executor(max_workers)
+    if previous is not None:
+        previous.shutdown(wait=False)
+
+
+def _get_async_executor():
+    global _async_executor
+    with _async_executor_lock:
+        if _async_executor is None:
+            _async_executor = _new_async_executor(None)
+        return _async_executor
+
+
+async def finalise_lizardplot_async(plot, source_text, executor=None, **kwargs):
+    """
+    Asyncio version of `finalise_lizardplot`, e.g. for web services.
+
+    The plot is finalised on a bounded thread pool (see `set_async_workers`), so the event
+    loop keeps serving other requests while it renders. Use figures created with
+    `matplotlib.figure.Figure` rather than `plt.subplots`: they are not registered with pyplot
+    and can be rendered from any thread. A figure must not be used by two calls at the same time.
+
+    Parameters:
+    - plot (matplotlib.figure.Figure): The plot to be finalised.
+    - source_text (str): The source text to be displayed at the bottom of the plot.
+    - executor (concurrent.futures.Executor, optional): Executor to run on instead of the shared thread pool.
+    - **kwargs: Further arguments of `finalise_lizardplot`, e.g. return_as='bytes'.
+
+    Returns:
+    The return value of `finalise_lizardplot`.
+
+    Example:
+    #>>> from matplotlib.figure import Figure
+    #>>> fig = Figure()
+    #>>> fig.add_subplot().plot([0, 1], [0, 1])
+    #>>> png = await finalise_lizardplot_async(fig, "Source: BioLizard Data", return_as='bytes')
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(finalise_lizardplot, plot, source_text, **kwargs)
+    return await loop.run_in_executor(executor or _get_async_executor(), call)
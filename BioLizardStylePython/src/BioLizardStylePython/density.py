@@ -0,0 +1,130 @@
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.colors
+from .utils import biolizard_qualitative_pal, l_viridis_pal
+
+__all__ = ['lizard_density_scatter']
+
+
+def _axes_pixels(ax, dpi):
+    """
+    Size (width, height) of the axes in output pixels at `dpi`.
+    """
+    size = ax.get_position().size * ax.figure.get_size_inches() * dpi
+    return tuple(np.maximum(1, size.astype(int)))
+
+
+def _eq_hist_norm(values):
+    """
+    Histogram equalisation as a matplotlib norm: every value maps to its quantile among `values`.
+    """
+    levels = np.unique(values[np.isfinite(values)])
+    if len(levels) < 2:
+        return matplotlib.colors.Normalize()
+    quantiles = np.linspace(0, 1, len(levels))
+    return matplotlib.colors.FuncNorm((lambda v: np.interp(v, levels, quantiles),
+                                       lambda q: np.interp(q, quantiles, levels)),
+                                      vmin=levels[0], vmax=levels[-1])
+
+
+def _norm(name, values):
+    if name == 'eq_hist':
+        return _eq_hist_norm(values)
+    if name == 'log':
+        return matplotlib.colors.LogNorm()
+    if name == 'linear':
+        return matplotlib.colors.Normalize()
+    raise ValueError("norm must be 'eq_hist', 'log' or 'linear'")
+
+
+def lizard_density_scatter(x, y, ax=None, agg='count', values=None, categories=None, bins=None,
+                           x_range=None, y_range=None, norm='eq_hist', cmap=None, min_alpha=0.15,
+                           dpi=300):
+    """
+    Density rendering of a scatter plot with millions of points, drawn as a single image.
+
+    The points are binned into a grid of about one bin per output pixel with NumPy, the grid is
+    shaded and drawn with one `imshow`. Drawing time and file size (also of PDF and SVG output)
+    no longer depend on the number of points.
+
+    Parameters:
+    - x, y (array-like): Coordinates of the points. Points with NaN coordinates are skipped.
+    - ax (matplotlib.axes.Axes, optional): Axes to draw in. Defaults to the current axes.
+    - agg (str, optional): 'count' (points per bin), 'mean' (mean of `values` per bin) or 'categorical'
+      (the colors of `categories` mixed by their share of the points in a bin, with the opacity
+      following the number of points). Defaults to 'count'.
+    - values (array-like, optional): Value per point, for agg='mean'.
+    - categories (array-like, optional): Category per point, for agg='categorical'.
+    - bins (tuple of int, optional): Grid size (nx, ny). Defaults to the axes size in pixels at `dpi`.
+    - x_range, y_range (tuple, optional): Data range of the grid. Default to the range of the points;
+      without points, both are needed and an empty (transparent) grid is drawn.
+    - norm (str, optional): Shading of counts, means or opacity: 'eq_hist' (histogram equalisation),
+      'log' or 'linear'. Defaults to 'eq_hist'.
+    - cmap (matplotlib.colors.Colormap, optional): Defaults to l_viridis_pal, or biolizard_qualitative_pal
+      for categorical aggregation (one color per category, in sorted order of the categories).
+    - min_alpha (float, optional): Opacity of the least dense non-empty bins for agg='categorical'. Defaults to 0.15.
+    - dpi (int, optional): Output resolution the default grid is sized for, one bin per pixel; pass the dpi
+      given to `finalise_lizardplot`. Defaults to 300.
+
+    Returns:
+    matplotlib.image.AxesImage. Empty bins are transparent. For agg='categorical', the sorted categories
+    are stored as `image.categories` and their colors as `image.category_colors`.
+
+    Example:
+    #>>> lizard_style()
+    #>>> fig, ax = plt.subplots()
+    #>>> image = lizard_density_scatter(umap[:, 0], umap[:, 1], ax=ax)
+    #>>> fig.colorbar(image, ax=ax, label='cells')
+    #>>> finalise_lizardplot(fig, "Source: BioLizard Data", pdf=True, vector=True)
+    """
+    if agg not in ('count', 'mean', 'categorical'):
+        raise ValueError("agg must be 'count', 'mean' or 'categorical'")
+    if agg == 'mean' and values is None:
+        raise ValueError("agg='mean' needs values")
+    if agg == 'categorical' and categories is None:
+        raise ValueError("agg='categorical' needs categories")
+    ax = plt.gca() if ax is None else ax
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = np.isfinite(x) & np.isfinite(y)
+    if not keep.any() and (x_range is None or y_range is None):
+        raise ValueError("no points with finite coordinates: give x_range and y_range to draw an empty grid")
+    x0, x1 = (np.min(x[keep]), np.max(x[keep])) if x_range is None else x_range
+    y0, y1 = (np.min(y[keep]), np.max(y[keep])) if y_range is None else y_range
+    keep &= (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+    nx, ny = _axes_pixels(ax, dpi) if bins is None else bins
+
+    # flat bin index of every point, row-major with y as rows
+    ix = np.minimum(((x[keep] - x0) * (nx / (x1 - x0 or 1))).astype(np.intp), nx - 1)
+    iy = np.minimum(((y[keep] - y0) * (ny / (y1 - y0 or 1))).astype(np.intp), ny - 1)
+    index = iy * nx + ix
+    counts = np.bincount(index, minlength=nx * ny).reshape(ny, nx)
+    extent = (x0, x1, y0, y1)
+    imshow_kwargs = {'extent': extent, 'origin': 'lower', 'aspect': 'auto', 'interpolation': 'none'}
+
+    if agg == 'categorical':
+        labels, codes = np.unique(np.asarray(categories)[keep], return_inverse=True)
+        cmap = biolizard_qualitative_pal if cmap is None else cmap
+        colors = np.asarray(cmap(np.arange(len(labels)) % cmap.N))[:, :3]
+        filled = counts > 0
+        rgba = np.zeros((ny, nx, 4))
+        # sum of the point colors per bin, one channel at a time: memory stays at the grid size
+        # whatever the number of categories
+        for channel in range(3):
+            rgba[..., channel] = np.bincount(index, weights=colors[codes, channel], minlength=nx * ny).reshape(ny, nx)
+        rgba[..., :3] /= np.maximum(counts, 1)[..., None]
+        opacity = _norm(norm, counts[filled].astype(float))(counts[filled].astype(float))
+        rgba[filled, 3] = min_alpha + (1 - min_alpha) * np.clip(np.asarray(opacity), 0, 1)
+        image = ax.imshow(rgba, **imshow_kwargs)
+        image.categories = labels
+        image.category_colors = colors
+        return image
+
+    if agg == 'mean':
+        sums = np.bincount(index, weights=np.asarray(values, dtype=float)[keep], minlength=nx * ny).reshape(ny, nx)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            grid = sums / counts
+    else:
+        grid = counts.astype(float)
+    grid[counts == 0] = np.nan  # empty bins are transparent
+    return ax.imshow(grid, cmap=l_viridis_pal if cmap is None else cmap, norm=_norm(norm, grid), **imshow_kwargs)
@@ -0,0 +1,419 @@
+import io
+import os
+import re
+import base64
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache, cached_property
+from xml.etree import ElementTree
+import numpy as np
+from PIL import Image
+import matplotlib
+import matplotlib.image
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.patches import Rectangle
+from matplotlib.image import AxesImage
+from ._palettes import _package_version
+from ._fonts import lato_family
+
+__all__ = ['LogoAssets', 'get_logo', 'set_logo', 'footer_image', 'set_footer_cache', 'clear_footer_cache',
+           'footer_cache_info']
+
+_FOOTER_HEIGHT_INCHES = 0.4
+
+
+def _render_rgba(fig, dpi):
+    """
+    Render a figure with Agg and return its RGBA buffer as (height, width, 4) uint8 array.
+
+    The array is a view on the renderer buffer, not a copy. The figure keeps its own
+    canvas and dpi.
+
+    Parameters:
+    - fig (matplotlib.figure.Figure): The figure to render.
+    - dpi (float): Resolution of the rendering.
+    """
+    original_canvas = fig.canvas
+    original_dpi = fig.dpi
+    canvas = FigureCanvasAgg(fig)  # temporarily attaches itself to the figure, like savefig does
+    try:
+        fig.dpi = dpi
+        canvas.draw()
+    finally:
+        fig.dpi = original_dpi
+        fig.set_canvas(original_canvas)
+    return np.asarray(canvas.buffer_rgba())
+
+
+def _figure_to_image(fig, dpi):
+    """
+    Render a figure with Agg and wrap its RGBA buffer in a PIL image.
+
+    This gives the same pixels as `fig.savefig(format='png', dpi=dpi)` followed by
+    `Image.open`, without the PNG compression and decompression: the image shares
+    memory with the renderer buffer.
+
+    Parameters:
+    - fig (matplotlib.figure.Figure): The figure to render.
+    - dpi (float): Resolution of the rendering.
+
+    Returns:
+    PIL.Image.Image in RGBA mode.
+    """
+    buf = _render_rgba(fig, dpi)
+    return Image.frombuffer('RGBA', (buf.shape[1], buf.shape[0]), buf, 'raw', 'RGBA', 0, 1)
+
+
+_DEFAULT_LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logo', 'BiolizardLogo.png')
+
+
+def _import_cairosvg():
+    try:
+        import cairosvg
+    except ModuleNotFoundError:
+        print('SVG logos are rasterised with cairosvg for PNG and PDF output. Install with `pip install BioLizardStylePython[svg]`')
+        raise
+    return cairosvg
+
+
+class LogoAssets:
+    """
+    The footer logo, decoded once per process.
+
+    Resampled variants for the pixel sizes in use are memoized, so raster footers paste
+    them directly instead of resampling the full-resolution logo through `imshow`.
+    SVG logos stay vector graphics in SVG output; for PNG and PDF output they are
+    rasterised with the optional `cairosvg` package.
+
+    Parameters:
+    - path (str, optional): Path to the logo, any image format Pillow can read or SVG.
+      Defaults to the BioLizard logo.
+
+    Example:
+    #>>> set_logo('my_logo.svg')
+    #>>> finalise_lizardplot(fig, "Source: BioLizard Data", vector=True, save_filepath='plot.svg')
+    """
+
+    def __init__(self, path=None):
+        self.path = os.path.abspath(path) if path else _DEFAULT_LOGO
+        self.is_svg = self.path.lower().endswith('.svg')
+        self._resized = {}
+        self._lock = threading.Lock()
+
+    @cached_property
+    def svg(self):
+        """The SVG source of an SVG logo, None for raster logos."""
+        if not self.is_svg:
+            return None
+        with open(self.path, 'rb') as fh:
+            return fh.read()
+
+    @cached_property
+    def aspect(self):
+        """Width / height of the logo."""
+        if self.is_svg:
+            return _svg_aspect(self.svg)
+        with Image.open(self.path) as img:
+            return img.width / img.height
+
+    @cached_property
+    def image(self):
+        """The logo as RGBA PIL image."""
+        if self.is_svg:
+            png = _import_cairosvg().svg2png(bytestring=self.svg, output_width=2000)
+            return Image.open(io.BytesIO(png)).convert('RGBA')
+        with Image.open(self.path) as img:
+            return img.convert('RGBA')
+
+    @cached_property
+    def array(self):
+        """The logo as read-only float array, as drawn by `imshow` in vector footers."""
+        if self.is_svg:
+            img = np.asarray(self.image, dtype=np.float32) / 255
+        else:
+            img = matplotlib.image.imread(self.path)
+        img.setflags(write=False)
+        return img
+
+    def resized(self, size):
+        """
+        The logo resampled to `size` (width, height) in pixels, memoized per size.
+        """
+        with self._lock:  # shared between the threads finalising plots
+            if size not in self._resized:
+                if self.is_svg:
+                    png = _import_cairosvg().svg2png(bytestring=self.svg, output_width=size[0], output_height=size[1])
+                    img = Image.open(io.BytesIO(png)).convert('RGBA')
+                else:
+                    img = self.image.resize(size, Image.Resampling.LANCZOS)
+                self._resized[size] = img
+            return self._resized[size]
+
+
+def _svg_aspect(svg):
+    root = ElementTree.fromstring(svg)
+    view_box = root.get('viewBox')
+    if view_box:
+        _, _, width, height = (float(v) for v in view_box.replace(',', ' ').split())
+    else:
+        width, height = (float(re.match(r'[\d.]+', root.get(key)).group()) for key in ('width', 'height'))
+    return width / height
+
+
+_logo = LogoAssets()
+
+
+def get_logo():
+    """
+    Return the `LogoAssets` used in the footers of this process.
+    """
+    return _logo
+
+
+def set_logo(path=None):
+    """
+    Use a custom logo in the footers of this process.
+
+    Parameters:
+    - path (str, optional): Path to the logo, any image format Pillow can read or SVG.
+      Defaults to the BioLizard logo.
+    """
+    global _logo
+    _logo = LogoAssets(path)
+
+
+def _logo_assets(path):
+    """
+    The `LogoAssets` of the logo at `path`: the current logo, with its memoized sizes, or else a new one.
+    """
+    logo = _logo
+    return logo if logo.path == path else LogoAssets(path)
+
+
+def _logo_box(width, height, aspect):
+    """
+    Pixel box (left, top, width, height) of the logo in a footer of `width` x `height` pixels.
+
+    This is where `imshow` places the logo: in the right 10% of the footer, shifted down by
+    9% of the footer height, shrunk to the logo aspect ratio and anchored to the top right.
+    """
+    box_width, box_height = 0.10 * width, height
+    box_top = 0.09 * height
+    if box_width / box_height > aspect:
+        logo_width, logo_height = box_height * aspect, box_height
+    else:
+        logo_width, logo_height = box_width, box_width / aspect
+    return (round(width - logo_width), round(box_top), max(1, round(logo_width)), max(1, round(logo_height)))
+
+
+_LOGO_GID = 'biolizard-logo'
+
+
+class _SharedLogoImage(AxesImage):
+    """
+    Logo image drawn unresampled and from one shared array, so every page of a multi-page PDF
+    refers to a single embedded image (matplotlib's PDF backend deduplicates images by identity).
+    """
+
+    _shared = {}  # logo path -> RGBA uint8 array last drawn
+    _shared_lock = threading.Lock()
+
+    def make_image(self, renderer, magnification=1.0, unsampled=False):
+        im, left, bottom, trans = super().make_image(renderer, magnification, unsampled)
+        if unsampled and im is not None:
+            with self._shared_lock:
+                shared = self._shared.get(_logo.path)
+                if shared is not None and shared.shape == im.shape and np.array_equal(shared, im):
+                    im = shared
+                else:
+                    self._shared[_logo.path] = im
+        return im, left, bottom, trans
+
+
+def _draw_footer(fig, rect, source_text, fontsize, font_name=None, draw_logo=True, logo_placeholder=False,
+                 share_logo=False):
+    """
+    Draw the footer (rule, source text and logo) into a figure.
+
+    Parameters:
+    - fig (matplotlib.figure.Figure): The figure to draw into.
+    - rect (list): [left, bottom, width, height] of the footer, in figure coordinates.
+    - source_text (str): The source text to be displayed in the footer.
+    - fontsize (int): Font size of the source text.
+    - font_name (str, optional): Font of the source text. Defaults to Lato.
+    - draw_logo (bool, optional): If False, only the logo axes are added, empty, e.g. to paste the logo later.
+    - logo_placeholder (bool, optional): If True, draw an invisible rectangle with the gid `_LOGO_GID`
+      where the logo goes, to be replaced by the SVG logo with `_inline_svg_logo`.
+    - share_logo (bool, optional): If True, the logo is drawn at full resolution from one shared array,
+      so it is embedded only once in a multi-page PDF, see `_SharedLogoImage`.
+
+    Returns:
+    list of the added axes, so they can be removed again.
+    """
+    left, bottom, width, height = rect
+    ax = fig.add_axes(rect)
+    ax.plot([0, 1], [1, 1], color='black', linewidth=1.5, transform=ax.transAxes)
+
+    if font_name is None:
+        font_name = lato_family()
+
+    ax.text(0.05, 0.5, source_text, verticalalignment='center', transform=ax.transAxes, fontsize=fontsize,
+            fontname=font_name)
+
+    ax_image = fig.add_axes([left + 0.90 * width, bottom - 0.09 * height, 0.10 * width, height],
+                            anchor='NE', zorder=-1)
+
+    if logo_placeholder:
+        ax_image.set_xlim(0, _logo.aspect)
+        ax_image.set_ylim(0, 1)
+        ax_image.set_aspect('equal')
+        ax_image.add_patch(Rectangle((0, 0), _logo.aspect, 1, facecolor='none', edgecolor='none', gid=_LOGO_GID))
+    elif share_logo:
+        image = _SharedLogoImage(ax_image, interpolation='none')
+        image.set_data(_logo.array)
+        ax_image.add_image(image)
+        ax_image.set_xlim(-0.5, _logo.array.shape[1] - 0.5)
+        ax_image.set_ylim(_logo.array.shape[0] - 0.5, -0.5)
+        ax_image.set_aspect('equal')
+    elif draw_logo:
+        ax_image.imshow(_logo.array)
+    ax_image.axis('off')
+    ax.axis('off')
+    return [ax, ax_image]
+
+
+def _inline_svg_logo(svg):
+    """
+    Replace the logo placeholder in matplotlib SVG output by the SVG logo itself.
+
+    Parameters:
+    - svg (str): SVG document written by matplotlib, with a footer drawn with `logo_placeholder=True`.
+
+    Returns:
+    str: the SVG document with the logo embedded as vector image.
+    """
+    group = re.search(r'<g id="%s">.*?</g>' % _LOGO_GID, svg, flags=re.DOTALL)
+    path = re.search(r' d="([^"]*)"', group.group())
+    coords = np.array([float(v) for v in re.findall(r'-?[\d.]+(?:e-?\d+)?', path.group(1))]).reshape(-1, 2)
+    (x0, y0), (x1, y1) = coords.min(axis=0), coords.max(axis=0)
+    data = base64.b64encode(_logo.svg).decode('ascii')
+    image = (f'<image x="{x0:g}" y="{y0:g}" width="{x1 - x0:g}" height="{y1 - y0:g}" preserveAspectRatio="none" '
+             f'xlink:href="data:image/svg+xml;base64,{data}"/>')
+    return svg[:group.start()] + image + svg[group.end():]
+
+
+def _render_footer(width, source_text, fontsize, dpi, font_name, logo_path):
+    """
+    Rasterise the footer strip for a plot of `width` pixels.
+
+    The rule and text are rendered by matplotlib; the pre-resampled logo at `logo_path`, the
+    logo of the cache key, is pasted on top. The figure is not registered with pyplot, so
+    footers can be rendered from any thread.
+    """
+    logo = _logo_assets(logo_path)
+    fig = Figure(figsize=(width / dpi, _FOOTER_HEIGHT_INCHES))
+    _draw_footer(fig, [0, 0, 1, 1], source_text, fontsize, font_name, draw_logo=False)
+    img = _figure_to_image(fig, dpi)
+    left, top, logo_width, logo_height = _logo_box(img.width, img.height, logo.aspect)
+    img = img.copy()
+    img.alpha_composite(logo.resized((logo_width, logo_height)), dest=(left, top))
+    return img
+
+
+# Rendered footer strips are kept in an in-memory LRU cache and, optionally, as PNG
+# files in a cache directory shared between processes and runs.
+_footer_cache_dir = None
+_footer_disk_hits = 0
+_footer_stats_lock = threading.Lock()
+
+
+def _load_footer(width, source_text, fontsize, dpi, font_name, logo_path):
+    global _footer_disk_hits
+    path = None
+    if _footer_cache_dir is not None:
+        key = (width, source_text, fontsize, dpi, font_name, logo_path, os.path.getmtime(logo_path),
+               _package_version())
+        path = os.path.join(_footer_cache_dir, f'footer-{hashlib.sha1(repr(key).encode()).hexdigest()}.png')
+        try:
+            with Image.open(path) as img:
+                img.load()
+            with _footer_stats_lock:
+                _footer_disk_hits += 1
+            return img
+        except OSError:
+            pass
+    img = _render_footer(width, source_text, fontsize, dpi, font_name, logo_path)
+    if path is not None:
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=_footer_cache_dir, suffix='.png')
+            with os.fdopen(fd, 'wb') as fh:
+                img.save(fh, format='PNG')
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+    return img
+
+
+_cached_footer = lru_cache(maxsize=32)(_load_footer)
+
+
+def footer_image(width, source_text, fontsize=12, dpi=300):
+    """
+    Return the rendered footer strip for a plot of `width` pixels.
+
+    Footers are cached on (width, source_text, fontsize, dpi, font, logo), so finalising many
+    plots with the same source text only renders the footer once.
+
+    Parameters:
+    - width (int): Width of the plot in pixels.
+    - source_text (str): The source text to be displayed in the footer.
+    - fontsize (int, optional): Font size of the source text. Defaults to 12.
+    - dpi (int, optional): Resolution of the footer. Defaults to 300.
+
+    Returns:
+    PIL.Image.Image in RGBA mode. The image is shared with the cache and must not be modified.
+    """
+    return _cached_footer(width, source_text, fontsize, dpi, lato_family(), _logo.path)
+
+
+def set_footer_cache(maxsize=32, cache_dir=None):
+    """
+    Configure the footer cache. This also clears it.
+
+    Parameters:
+    - maxsize (int, optional): Number of footers kept in memory. None for no limit, 0 to disable. Defaults to 32.
+    - cache_dir (str, optional): Directory to also store rendered footers in, as PNG files. Defaults to None (memory only).
+
+    Example:
+    #>>> set_footer_cache(maxsize=128, cache_dir=os.path.expanduser('~/.cache/biolizard_footers'))
+    """
+    global _cached_footer, _footer_cache_dir, _footer_disk_hits
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    _footer_cache_dir = cache_dir
+    _footer_disk_hits = 0
+    _cached_footer = lru_cache(maxsize=maxsize)(_load_footer)
+
+
+def clear_footer_cache():
+    """
+    Empty the in-memory footer cache and reset its statistics. Files in the cache directory are kept.
+    """
+    global _footer_disk_hits
+    _footer_disk_hits = 0
+    _cached_footer.cache_clear()
+
+
+def footer_cache_info():
+    """
+    Statistics of the footer cache.
+
+    Returns:
+    dict with 'hits' and 'misses' of the in-memory cache, 'disk_hits' (misses served from the
+    cache directory), 'maxsize', 'currsize' and 'cache_dir'.
+    """
+    info = _cached_footer.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'disk_hits': _footer_disk_hits,
+            'maxsize': info.maxsize, 'currsize': info.currsize, 'cache_dir': _footer_cache_dir}
@@ -0,0 +1,115 @@
+import os
+import warnings
+import numpy as np
+import matplotlib.pyplot as plt
+from .utils import biolizard_sequential_pal, biolizard_divergent_pal
+from .colorize import _CHUNK_SIZE, _data_range
+from .density import _axes_pixels
+
+__all__ = ['block_reduce', 'lizard_large_heatmap']
+
+
+def block_reduce(data, factor, how='mean', chunk_size=_CHUNK_SIZE):
+    """
+    Reduce a 2D array over blocks of values, ignoring NaN, without loading it in memory at once.
+
+    The rows are read in chunks of whole blocks, so memory-mapped or chunked arrays (a
+    `numpy.memmap`, or anything supporting `shape` and slicing of rows, such as a Zarr or HDF5
+    array) are reduced with a bounded amount of memory. Partial blocks at the bottom and right
+    edges are reduced over their available values; blocks with only NaN or masked values give NaN.
+
+    Parameters:
+    - data (array-like): 2D array. Masked arrays are supported.
+    - factor (int or tuple of int): Block size, or (rows, columns) of a block.
+    - how (str, optional): 'mean' or 'max'. Defaults to 'mean'.
+    - chunk_size (int, optional): Approximate number of values read at once. Defaults to 4194304.
+
+    Returns:
+    numpy.ndarray of dtype float32, with shape (ceil(rows / factor rows), ceil(columns / factor columns)).
+
+    Example:
+    #>>> counts = np.load('counts.npy', mmap_mode='r')  # 60000 x 100000
+    #>>> small = block_reduce(counts, (60, 100))  # 1000 x 1000
+    """
+    if how not in ('mean', 'max'):
+        raise ValueError("how must be 'mean' or 'max'")
+    if not hasattr(data, 'shape'):
+        data = np.asanyarray(data)
+    if len(data.shape) != 2:
+        raise ValueError("data must be a 2D array")
+    factor_y, factor_x = (factor, factor) if np.ndim(factor) == 0 else factor
+    ny, nx = data.shape
+    by, bx = -(-ny // factor_y), -(-nx // factor_x)
+    result = np.empty((by, bx), dtype=np.float32)
+    rows = factor_y * max(1, chunk_size // (factor_y * bx * factor_x))  # whole blocks of rows
+    buffer = np.full((rows, bx * factor_x), np.nan, dtype=np.float32)  # NaN padding of partial blocks
+    reduce = np.nanmax if how == 'max' else np.nanmean
+    for start in range(0, ny, rows):
+        chunk = data[start:start + rows]
+        n = chunk.shape[0]
+        buffer[:n, :nx] = np.ma.getdata(chunk)
+        if np.ma.is_masked(chunk):
+            buffer[:n, :nx][np.ma.getmaskarray(chunk)] = np.nan
+        buffer[n:] = np.nan
+        blocks = buffer[:-(-n // factor_y) * factor_y].reshape(-1, factor_y, bx, factor_x)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # blocks with only NaN stay NaN
+            result[start // factor_y:start // factor_y + blocks.shape[0]] = reduce(blocks, axis=(1, 3))
+    return result
+
+
+def lizard_large_heatmap(data, ax=None, agg='mean', cmap=None, vmin=None, vmax=None, center=None, max_shape=None,
+                         chunk_size=_CHUNK_SIZE, dpi=300):
+    """
+    Heatmap of a matrix too large for memory, such as a memory-mapped genes x cells matrix.
+
+    The matrix is reduced block by block to at most one value per output pixel with `block_reduce`,
+    never loading the full matrix, and the reduced image is drawn with `imshow`. The axes keep the
+    row and column indices of the full matrix. Use it after `lizard_style()` and finish with
+    `finalise_lizardplot`.
+
+    Parameters:
+    - data (array-like, str or os.PathLike): 2D array, e.g. a `numpy.memmap` or Zarr array, or the path
+      of a `.npy` file, which is memory-mapped.
+    - ax (matplotlib.axes.Axes, optional): Axes to draw in. Defaults to the current axes.
+    - agg (str, optional): Aggregation over the values of a pixel, 'mean' or 'max'. Defaults to 'mean'.
+    - cmap (matplotlib.colors.Colormap or str, optional): Defaults to biolizard_sequential_pal, or
+      biolizard_divergent_pal when `center` is given.
+    - vmin, vmax (float, optional): Color range. Default to the range of the reduced values.
+    - center (float, optional): Value in the middle of a divergent colormap; the default color range is
+      made symmetric around it.
+    - max_shape (tuple of int, optional): Maximum (rows, columns) of the reduced image. Defaults to the
+      axes size in pixels at `dpi`.
+    - chunk_size (int, optional): Approximate number of matrix values read at once. Defaults to 4194304.
+    - dpi (int, optional): Output resolution the default max_shape is sized for; pass the dpi given to
+      `finalise_lizardplot`. Defaults to 300.
+
+    Returns:
+    matplotlib.image.AxesImage, e.g. for `fig.colorbar`. NaN values are transparent.
+
+    Example:
+    #>>> lizard_style()
+    #>>> fig, ax = plt.subplots(figsize=(8, 5))
+    #>>> image = lizard_large_heatmap('log_fold_changes.npy', ax=ax, center=0)
+    #>>> fig.colorbar(image, ax=ax, label='log2 fold change')
+    #>>> finalise_lizardplot(fig, "Source: BioLizard Data")
+    """
+    if isinstance(data, (str, os.PathLike)):
+        data = np.load(data, mmap_mode='r')
+    ax = plt.gca() if ax is None else ax
+    ny, nx = data.shape
+    max_rows, max_columns = _axes_pixels(ax, dpi)[::-1] if max_shape is None else max_shape
+    factor_y, factor_x = max(1, -(-ny // max_rows)), max(1, -(-nx // max_columns))
+    image = block_reduce(data, (factor_y, factor_x), how=agg, chunk_size=chunk_size)
+    if center is not None:
+        low, high = _data_range(image, image.shape[0])
+        span = max(abs(high - center), abs(center - low))
+        vmin = center - span if vmin is None else vmin
+        vmax = center + span if vmax is None else vmax
+        cmap = biolizard_divergent_pal if cmap is None else cmap
+    cmap = biolizard_sequential_pal if cmap is None else cmap
+    extent = (-0.5, image.shape[1] * factor_x - 0.5, image.shape[0] * factor_y - 0.5, -0.5)
+    artist = ax.imshow(image, cmap=cmap, vmin=vmin, vmax=vmax, extent=extent, aspect='auto', interpolation='none')
+    ax.set_xlim(-0.5, nx - 0.5)  # partial blocks at the edges extend beyond the matrix
+    ax.set_ylim(ny - 0.5, -0.5)
+    return artist
@@ -1,8 +1,15 @@
 import plotly.graph_objects as go
 import plotly.io as pio
-import matplotlib.colors
 from fonts.ttf import Lato, LatoBold
-from .utils import biolizard_qualitative_pal, biolizard_divergent_pal, l_viridis_pal, blz_blue, blz_green
+from .utils import biolizard_qualitative_pal, blz_blue, blz_green
+from ._palettes import palette
+
+# Continuous colorscales are compacted to the fewest stops within this CIE76 ΔE of the full
+# 255-color palettes, which keeps every figure's JSON and HTML small. See set_colorscale_tolerance.
+_COLORSCALE_DELTA_E = 1.0
+
+# one memoized colorscale shared by every trace type below
+_l_viridis_colorscale = palette('l_viridis_pal').colorscale(delta_e=_COLORSCALE_DELTA_E)
 
 lizard_style_template = go.layout.Template()
 lizard_style_template.layout = {
@@ -13,9 +20,9 @@ lizard_style_template.layout = {
     'barmode' : 'group',
     'boxmode' : 'group',
     'coloraxis': {'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'}},
-    'colorscale': {'diverging': [matplotlib.colors.rgb2hex(biolizard_divergent_pal(i)) for i in range(255)],               
-                   'sequential': [matplotlib.colors.rgb2hex(l_viridis_pal(i)) for i in range(255)],
-                   'sequentialminus': [matplotlib.colors.rgb2hex(l_viridis_pal.reversed()(i)) for i in range(255)]},
+    'colorscale': {'diverging': palette('biolizard_divergent_pal').colorscale(delta_e=_COLORSCALE_DELTA_E),
+                   'sequential': _l_viridis_colorscale,
+                   'sequentialminus': palette('l_viridis_pal').colorscale(reverse=True, delta_e=_COLORSCALE_DELTA_E)},
     'colorway': biolizard_qualitative_pal.colors,
     'font': {'family': Lato, 'size': 12},
     'geo': {'bgcolor': blz_blue,
@@ -166,25 +173,25 @@ lizard_style_template.data = {
                           'startlinecolor': '#808080'},
                 'type': 'carpet'}],
     'choropleth': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'},
-                    'colorscale': [matplotlib.colors.rgb2hex(l_viridis_pal(i)) for i in range(255)],
+                    'colorscale': _l_viridis_colorscale,
                     'type': 'choropleth'}],
     'contour': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'},
-                 'colorscale': [matplotlib.colors.rgb2hex(l_viridis_pal(i)) for i in range(255)],
+                 'colorscale': _l_viridis_colorscale,
                  'type': 'contour'}],
     'contourcarpet': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'},
                        'type': 'contourcarpet'}],
     'heatmap': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'},
-                 'colorscale': [matplotlib.colors.rgb2hex(l_viridis_pal(i)) for i in range(255)],
+                 'colorscale': _l_viridis_colorscale,
                  'type': 'heatmap'}],
     # 'heatmapgl': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'},
-    #                'colorscale': [matplotlib.colors.rgb2hex(l_viridis_pal(i)) for i in range(255)],
+    #                'colorscale': _l_viridis_colorscale,
     #                'type': 'heatmapgl'}],
     'histogram': [{'marker': {'line': {'color': 'white', 'width': 0.6}}, 'type': 'histogram'}],
     'histogram2d': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'},
-                     'colorscale': [matplotlib.colors.rgb2hex(l_viridis_pal(i)) for i in range(255)],
+                     'colorscale': _l_viridis_colorscale,
                      'type': 'histogram2d'}],
     'histogram2dcontour': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'},
-                            'colorscale': [matplotlib.colors.rgb2hex(l_viridis_pal(i)) for i in range(255)],
+                            'colorscale': _l_viridis_colorscale,
                             'type': 'histogram2dcontour'}],
     'mesh3d': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'}, 'type': 'mesh3d'}],
     'parcoords': [{'line': {'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'}},
@@ -209,11 +216,41 @@ lizard_style_template.data = {
     'scatterternary': [{'marker': {'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'}},
                         'type': 'scatterternary'}],
     'surface': [{'colorbar': {'outlinewidth': 1, 'tickcolor': '#555555', 'ticks': 'outside', 'exponentformat': 'E'},
-                 'colorscale': [matplotlib.colors.rgb2hex(l_viridis_pal(i)) for i in range(255)],
+                 'colorscale': _l_viridis_colorscale,
                  'type': 'surface'}],
     'table': [{'cells': {'fill': {'color': 'white'}, 'line': {'color': '#808080'}},
                'header': {'fill': {'color': blz_green}, 'line': {'color': '#808080'}},
                'type': 'table'}]
 }
 
-pio.templates["lizard_style"] = lizard_style_template
\ No newline at end of file
+pio.templates["lizard_style"] = lizard_style_template
+
+# trace types using the l_viridis colorscale of the template
+_SEQUENTIAL_TRACES = ('choropleth', 'contour', 'heatmap', 'histogram2d', 'histogram2dcontour', 'surface')
+
+
+def set_colorscale_tolerance(delta_e=1.0):
+    """
+    Set how closely the colorscales of the lizard_style plotly template follow the full palettes.
+
+    The continuous colorscales are compacted to the fewest stops within `delta_e` (CIE76 ΔE in
+    CIELAB) of the 255-color palettes. Figures created afterwards with the template use the new
+    colorscales.
+
+    Parameters:
+    - delta_e (float, optional): Maximum perceptual error. Defaults to 1.0, below the just noticeable
+      difference of about 2.3. None embeds the full 255-color colorscales.
+
+    Example:
+    #>>> from BioLizardStylePython import set_colorscale_tolerance
+    #>>> set_colorscale_tolerance(0.5)
+    """
+    sequential = palette('l_viridis_pal').colorscale(delta_e=delta_e)
+    lizard_style_template.layout.colorscale = {
+        'diverging': palette('biolizard_divergent_pal').colorscale(delta_e=delta_e),
+        'sequential': sequential,
+        'sequentialminus': palette('l_viridis_pal').colorscale(reverse=True, delta_e=delta_e)}
+    for trace_type in _SEQUENTIAL_TRACES:
+        for trace in getattr(lizard_style_template.data, trace_type):
+            trace.colorscale = sequential
+    pio.templates["lizard_style"] = lizard_style_template
@@ -0,0 +1,238 @@
+import io
+import base64
+import warnings
+import numpy as np
+import plotly.graph_objects as go
+from PIL import Image
+from . import plotly_template  # registers the lizard_style template, which also styles scattergl
+from ._palettes import palette
+from .colorize import apply_colormap
+from .heatmap import block_reduce
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-triangle-three-buckets downsampling of a line.
+
+    The points are split in `n_out - 2` buckets; from every bucket the point forming the
+    largest triangle with the previously kept point and the average of the next bucket is
+    kept, together with the first and last point. Peaks and the visible shape are preserved.
+
+    Parameters:
+    - x (array-like): x coordinates, increasing.
+    - y (array-like): y coordinates, same length as x. NaN and infinite values are not supported (they
+      would win every bucket they fall in); drop them or split the line at them first.
+    - n_out (int): Number of points to keep, at least 3. Lines of at most n_out points are kept whole.
+
+    Returns:
+    numpy.ndarray of the indices of the kept points, increasing.
+
+    Example:
+    #>>> keep = lttb(x, y, 2000)
+    #>>> fig.add_scatter(x=x[keep], y=y[keep])
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out < 3:
+        raise ValueError("n_out must be at least 3: the first and last point and one bucket")
+    if not (np.all(np.isfinite(x)) and np.all(np.isfinite(y))):
+        raise ValueError("x and y must be finite, drop NaN and infinite values first")
+    if n_out >= n:
+        return np.arange(n)
+    # bucket i covers edges[i]:edges[i + 1], the first and last point are buckets of their own
+    edges = np.concatenate([[0], (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(int) + 1, [n]])
+    edges[-2] = n - 1
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x, edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y, edges[:-1]) / sizes
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(1, n_out - 1):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (mean_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i] = a
+    return keep
+
+
+def _subset_point_arrays(props, n, keep):
+    """
+    Take `keep` from every per-point array (length `n`) of a trace, e.g. text, customdata or marker.color.
+    """
+    for key, value in props.items():
+        if isinstance(value, dict):
+            _subset_point_arrays(value, n, keep)
+        elif isinstance(value, (list, tuple, np.ndarray)) and len(value) == n:
+            props[key] = np.asarray(value)[keep]
+
+
+def _numeric_x(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    if x.dtype.kind in 'iuf':
+        return x.astype(float)
+    try:
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)  # dates as strings
+    except (ValueError, TypeError):
+        return None
+
+
+def optimize_for_webgl(fig, threshold=10000, max_points=None):
+    """
+    Switch large `scatter` traces of a plotly figure to WebGL, and optionally downsample lines.
+
+    Traces with more than `threshold` points become `scattergl` traces with the same properties,
+    which the lizard_style template styles like `scatter`. Properties that WebGL traces do not
+    support (e.g. `fillpattern`) are dropped; stacked traces (`stackgroup`) are left as they are.
+    With `max_points`, line-only traces with increasing x are downsampled to `max_points` points
+    with `lttb`, which keeps peaks and the visible shape; per-point arrays such as `text`,
+    `customdata` or `marker.color` are downsampled along.
+
+    Parameters:
+    - fig (plotly.graph_objects.Figure): The figure, modified in place.
+    - threshold (int, optional): Number of points above which a trace is switched to WebGL. Defaults to 10000.
+    - max_points (int, optional): Number of points to downsample large line traces to, at least 3.
+      Traces with NaN or infinite y values are not downsampled. Defaults to None (no downsampling).
+
+    Returns:
+    The figure, so calls can be chained.
+
+    Example:
+    #>>> fig = go.Figure(go.Scatter(x=t, y=signal), layout=dict(template='lizard_style'))
+    #>>> optimize_for_webgl(fig, threshold=10000, max_points=5000).show()
+    """
+    if max_points is not None and max_points < 3:
+        raise ValueError("max_points must be at least 3")
+    traces = []
+    for trace in fig.data:
+        if trace.type != 'scatter' or trace.stackgroup is not None:
+            traces.append(trace)
+            continue
+        props = trace.to_plotly_json()
+        y = props.get('y')
+        n = 0 if y is None else len(y)
+        if n <= threshold:
+            traces.append(trace)
+            continue
+        props.pop('type')
+        mode = props.get('mode', 'lines')  # plotly draws lines only for traces of 20 points or more
+        if max_points is not None and n > max_points and mode == 'lines':
+            if props.get('x') is None:
+                x = props.pop('x0', 0) + props.pop('dx', 1) * np.arange(n)
+                props['x'] = x
+            x_numeric = _numeric_x(props['x'])
+            y_numeric = np.asarray(y, dtype=float) if np.asarray(y).dtype.kind in 'iuf' else None
+            if (x_numeric is not None and y_numeric is not None and np.all(np.diff(x_numeric) >= 0)
+                    and np.all(np.isfinite(y_numeric))):
+                keep = lttb(x_numeric, y_numeric, max_points)
+                _subset_point_arrays(props, n, keep)
+        traces.append(go.Scattergl(props, skip_invalid=True))
+    fig.data = []
+    fig.add_traces(traces)
+    return fig
+
+
+def _resolve_palette(name):
+    """
+    The `_Palette` and direction of a continuous palette name, e.g. 'l_viridis_pal' or 'biolizard_sequential_pal_r'.
+    """
+    reverse = name.endswith('_r')
+    return palette(name[:-2] if reverse else name), reverse
+
+
+def _encode_image(rgba, image_format):
+    buf = io.BytesIO()
+    img = Image.fromarray(rgba if (rgba[..., 3] < 255).any() else rgba[..., :3])  # no alpha channel without NaN
+    if image_format == 'webp':
+        img.save(buf, format='WEBP', lossless=True)
+    else:
+        img.save(buf, format='PNG')
+    return f'data:image/{image_format};base64,' + base64.b64encode(buf.getvalue()).decode('ascii')
+
+
+def _axis_grid(coords, n, factor):
+    """
+    Start and step of a uniformly spaced axis of `n` values, after reducing by `factor`.
+    """
+    if coords is None:
+        start, step = 0.0, 1.0
+    else:
+        coords = np.asarray(coords, dtype=float)
+        start, step = coords[0], (coords[-1] - coords[0]) / (n - 1) if n > 1 else 1.0
+    return start + (factor - 1) / 2 * step, factor * step
+
+
+def _block_factors(shape, max_size):
+    """
+    (rows, columns) of the smallest blocks that reduce a matrix of `shape` to at most `max_size` per side.
+    """
+    return tuple(max(1, -(-n // max_size)) for n in shape)
+
+
+def lizard_heatmap(z, x=None, y=None, colormap='l_viridis_pal', zmin=None, zmax=None, max_image_size=2048,
+                   hover_size=200, image_format='png', colorbar_title=None):
+    """
+    Plotly heatmap of a large matrix, sent to the browser as one compressed image.
+
+    The values are colored in Python with the uint8 lookup table of a lizard palette (`apply_colormap`)
+    and embedded as a PNG or WebP `go.Image`, instead of shipping every value as JSON. Hover values
+    come from a transparent heatmap of the matrix averaged down to `hover_size`, and a colorbar is
+    drawn from the same palette. Row 0 is drawn at the top, as in `imshow`.
+
+    Parameters:
+    - z (array-like): 2D matrix. NaN values are transparent.
+    - x (array-like, optional): Uniformly spaced coordinates of the columns. Defaults to the column indices.
+    - y (array-like, optional): Uniformly spaced coordinates of the rows. Defaults to the row indices.
+    - colormap (str, optional): 'l_viridis_pal', 'biolizard_sequential_pal' or 'biolizard_divergent_pal',
+      optionally with '_r'. Defaults to 'l_viridis_pal'.
+    - zmin, zmax (float, optional): Value range of the colormap. Default to the range of z.
+    - max_image_size (int, optional): Larger matrices are averaged over blocks down to at most this many
+      pixels per side. None keeps the full resolution. Defaults to 2048.
+    - hover_size (int, optional): Size of the hover grid per side. Defaults to 200.
+    - image_format (str, optional): 'png' or 'webp' (lossless). Defaults to 'png'.
+    - colorbar_title (str, optional): Title of the colorbar.
+
+    Returns:
+    plotly.graph_objects.Figure using the lizard_style template.
+
+    Example:
+    #>>> fig = lizard_heatmap(expression, colormap='biolizard_sequential_pal', colorbar_title='log2 CPM')
+    #>>> fig.write_html('expression.html')
+    """
+    if image_format not in ('png', 'webp'):
+        raise ValueError("image_format must be 'png' or 'webp'")
+    z = np.asarray(z)
+    if z.ndim != 2:
+        raise ValueError("z must be a 2D array")
+    pal, reverse = _resolve_palette(colormap)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        zmin = float(np.nanmin(z)) if zmin is None else zmin
+        zmax = float(np.nanmax(z)) if zmax is None else zmax
+
+    ny, nx = z.shape
+    # rows and columns are reduced separately, so e.g. a tall genes x samples matrix keeps its samples
+    factor = (1, 1) if max_image_size is None else _block_factors(z.shape, max_image_size)
+    image = apply_colormap(block_reduce(z, factor) if factor != (1, 1) else z, colormap, vmin=zmin, vmax=zmax)
+    y0, dy = _axis_grid(y, ny, factor[0])
+    x0, dx = _axis_grid(x, nx, factor[1])
+
+    hover_factor = _block_factors(z.shape, hover_size)
+    hover = block_reduce(z, hover_factor) if hover_factor != (1, 1) else z
+    hy0, hdy = _axis_grid(y, ny, hover_factor[0])
+    hx0, hdx = _axis_grid(x, nx, hover_factor[1])
+
+    fig = go.Figure(layout={'template': 'lizard_style'})
+    fig.add_trace(go.Image(source=_encode_image(image, image_format), x0=x0, dx=dx, y0=y0, dy=dy,
+                           hoverinfo='skip'))
+    fig.add_trace(go.Heatmap(z=hover, x0=hx0, dx=hdx, y0=hy0, dy=hdy, opacity=0, showscale=False,
+                             hovertemplate='x: %{x}<br>y: %{y}<br>z: %{z}<extra></extra>'))
+    colorscale = pal.colorscale(reverse=reverse, delta_e=1.0)
+    fig.add_trace(go.Scatter(x=[None], y=[None], mode='markers', showlegend=False, hoverinfo='skip',
+                             marker={'colorscale': colorscale, 'cmin': zmin, 'cmax': zmax, 'color': [zmin],
+                                     'showscale': True, 'colorbar': {'title': {'text': colorbar_title}}}))
+    return fig
@@ -0,0 +1,86 @@
+import time
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from .utils import _save_vector, _read_rss
+
+__all__ = ['LizardPdfReport']
+
+
+class LizardPdfReport:
+    """
+    Multi-page PDF report of finalised plots, written one page at a time.
+
+    Every page is a plot with the lizard footer (rule, source text and logo), drawn as vector graphics
+    like `finalise_lizardplot(..., pdf=True, vector=True)`, and appended to a single PDF stream with
+    matplotlib's `PdfPages`. Pages are written as they are added, so memory does not grow with the
+    number of pages; the Lato font is embedded once for the whole report and the logo is embedded once
+    and shared by all pages. Images and rasterised layers of the plots are embedded by matplotlib when
+    the report is closed, so keep them small in very long reports.
+
+    Parameters:
+    - path (str or file-like): Where to write the PDF.
+    - source_text (str, optional): Default source text of the pages.
+    - fontsize (int, optional): Font size of the source text. Defaults to 12.
+    - dpi (int, optional): Resolution of rasterised layers. Defaults to 300.
+    - rasterize_above (int, optional): Rasterise collections and images with more elements, see
+      `finalise_lizardplot`. Defaults to None.
+    - close_figures (bool, optional): Close pyplot figures once their page is written. Defaults to True.
+    - metadata (dict, optional): PDF metadata, e.g. {'Title': ..., 'Author': ...}.
+
+    Attributes:
+    - pages (list of dict): One entry per page with 'page' (1-based), 'seconds' (time to write the page)
+      and 'rss_bytes' (resident memory after the page, None where /proc is not available, e.g. macOS
+      and Windows).
+
+    Example:
+    #>>> with LizardPdfReport('report.pdf', source_text="Source: BioLizard Data") as report:
+    #>>>     for gene in genes:
+    #>>>         fig, ax = plt.subplots()
+    #>>>         ax.plot(expression[gene])
+    #>>>         report.add(fig)
+    #>>> print(sum(page['seconds'] for page in report.pages))
+    """
+
+    def __init__(self, path, source_text=None, fontsize=12, dpi=300, rasterize_above=None, close_figures=True,
+                 metadata=None):
+        self.source_text = source_text
+        self.fontsize = fontsize
+        self.dpi = dpi
+        self.rasterize_above = rasterize_above
+        self.close_figures = close_figures
+        self.pages = []
+        self._pdf = PdfPages(path, metadata=metadata)
+
+    def add(self, plot, source_text=None):
+        """
+        Append a finalised plot as the next page.
+
+        Parameters:
+        - plot (matplotlib.figure.Figure): The plot.
+        - source_text (str, optional): Source text of this page. Defaults to the report's source text.
+
+        Returns:
+        dict: the timing entry of the page, see `pages`.
+        """
+        start = time.perf_counter()
+        source_text = self.source_text if source_text is None else source_text
+        if source_text is None:
+            raise ValueError("no source text given for the page or the report")
+        plot.subplots_adjust(left=0.11, bottom=0.13, right=0.95)
+        _save_vector(plot, self._pdf, source_text, self.fontsize, self.dpi, True, self.rasterize_above,
+                     share_logo=True)
+        if self.close_figures:
+            plt.close(plot)
+        entry = {'page': len(self.pages) + 1, 'seconds': time.perf_counter() - start, 'rss_bytes': _read_rss('VmRSS')}
+        self.pages.append(entry)
+        return entry
+
+    def close(self):
+        """Write the shared resources and finish the PDF."""
+        self._pdf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,128 @@
+import io
+import numpy as np
+import pytest
+from matplotlib.figure import Figure
+from BioLizardStylePython import (lizard_density_scatter, finalise_lizardplot, lizard_style, block_reduce,
+                                  lizard_large_heatmap, biolizard_divergent_pal)
+
+
+def _axes():
+    fig = Figure(figsize=(4, 3))
+    return fig, fig.add_subplot()
+
+
+def test_count_grid_matches_histogram():
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(size=(2, 10000))
+    x[:10] = np.nan
+    _, ax = _axes()
+    image = lizard_density_scatter(x, y, ax=ax, bins=(40, 30), norm='linear')
+    grid = image.get_array()
+    assert grid.shape == (30, 40)
+    assert np.nansum(grid.filled(np.nan)) == 9990
+    expected, _, _ = np.histogram2d(y[10:], x[10:], bins=(30, 40))
+    assert np.array_equal(np.nan_to_num(grid.filled(np.nan)), expected)
+
+
+def test_empty_bins_are_transparent():
+    _, ax = _axes()
+    image = lizard_density_scatter([0, 1], [0, 1], ax=ax, bins=(4, 4))
+    rgba = image.to_rgba(image.get_array())
+    assert rgba[0, 0, 3] > 0 and rgba[3, 3, 3] > 0
+    assert rgba[1, 2, 3] == 0
+
+
+def test_mean_aggregation():
+    _, ax = _axes()
+    image = lizard_density_scatter([0, 0.1, 1], [0, 0.1, 1], ax=ax, agg='mean', values=[1, 3, 7], bins=(2, 2))
+    grid = image.get_array().filled(np.nan)
+    assert grid[0, 0] == 2 and grid[1, 1] == 7
+    assert np.isnan(grid[0, 1])
+
+
+def test_categorical_mixes_category_colors():
+    _, ax = _axes()
+    image = lizard_density_scatter([0, 0, 1], [0, 0, 1], ax=ax, agg='categorical', categories=['b', 'a', 'b'],
+                                   bins=(2, 2))
+    assert list(image.categories) == ['a', 'b']
+    rgba = image.get_array()
+    assert np.allclose(rgba[0, 0, :3], image.category_colors.mean(axis=0))
+    assert np.allclose(rgba[1, 1, :3], image.category_colors[1])
+    assert rgba[0, 1, 3] == 0 and rgba[0, 0, 3] > rgba[1, 1, 3] > 0
+
+
+def test_invalid_arguments():
+    _, ax = _axes()
+    with pytest.raises(ValueError):
+        lizard_density_scatter([0, 1], [0, 1], ax=ax, agg='sum')
+    with pytest.raises(ValueError):
+        lizard_density_scatter([0, 1], [0, 1], ax=ax, agg='mean')
+    with pytest.raises(ValueError):
+        lizard_density_scatter([0, 1], [0, 1], ax=ax, norm='sqrt')
+
+
+def test_vector_output_size_independent_of_points():
+    lizard_style()
+    rng = np.random.default_rng(1)
+    sizes = []
+    for n in (1000, 100000):
+        fig, ax = _axes()
+        lizard_density_scatter(*rng.normal(size=(2, n)), ax=ax, bins=(200, 150), x_range=(-4, 4), y_range=(-4, 4))
+        buf = io.BytesIO()
+        finalise_lizardplot(fig, "Source: BioLizard", save_filepath=buf, pdf=True, vector=True)
+        sizes.append(len(buf.getvalue()))
+    assert sizes[1] < 2 * sizes[0]
+
+
+def test_block_reduce_matches_in_memory_reduction():
+    rng = np.random.default_rng(2)
+    data = rng.normal(size=(103, 257)).astype(np.float32)
+    data[5:9, 3:40] = np.nan
+    padded = np.full((104, 259), np.nan, dtype=np.float32)
+    padded[:103, :257] = data
+    blocks = padded.reshape(26, 4, 37, 7)
+    for how, reduce in [('mean', np.nanmean), ('max', np.nanmax)]:
+        expected = reduce(blocks, axis=(1, 3))
+        for chunk_size in (100, 5000, 10 ** 7):
+            assert np.allclose(block_reduce(data, (4, 7), how=how, chunk_size=chunk_size), expected, equal_nan=True)
+    with pytest.raises(ValueError):
+        block_reduce(data, 2, how='sum')
+
+
+def test_large_heatmap_from_memmap(tmp_path):
+    path = tmp_path / 'matrix.npy'
+    matrix = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(1000, 3000))
+    matrix[:] = np.linspace(-1, 3, 3000)
+    matrix.flush()
+    fig, ax = _axes()
+    image = lizard_large_heatmap(path, ax=ax, center=0, max_shape=(100, 200), chunk_size=10000)
+    assert image.get_array().shape == (100, 200)
+    assert image.cmap.name == biolizard_divergent_pal.name
+    assert image.get_clim() == pytest.approx((-3, 3), abs=0.02)
+    assert ax.get_xlim() == (-0.5, 2999.5) and ax.get_ylim() == (999.5, -0.5)
+
+
+def test_no_points():
+    _, ax = _axes()
+    with pytest.raises(ValueError, match='x_range and y_range'):
+        lizard_density_scatter([], [], ax=ax)
+    with pytest.raises(ValueError, match='x_range and y_range'):
+        lizard_density_scatter([np.nan, 1], [0, np.nan], ax=ax, x_range=(0, 1))
+    image = lizard_density_scatter([np.nan], [np.nan], ax=ax, x_range=(0, 1), y_range=(0, 2), bins=(4, 3))
+    assert image.get_array().mask.all() and image.get_extent() == [0, 1, 0, 2]
+    image = lizard_density_scatter([], [], ax=ax, agg='categorical', categories=[], x_range=(0, 1), y_range=(0, 1),
+                                   bins=(4, 3))
+    assert (image.get_array()[..., 3] == 0).all()
+
+
+def test_default_grid_follows_dpi():
+    _, ax = _axes()
+    grid = lizard_density_scatter([0, 1], [0, 1], ax=ax).get_array()
+    small = lizard_density_scatter([0, 1], [0, 1], ax=ax, dpi=100).get_array()
+    assert np.allclose(small.shape, np.array(grid.shape) / 3, atol=1)
+    rng = np.random.default_rng(2)
+    categories = rng.integers(0, 50, size=1000)
+    image = lizard_density_scatter(*rng.normal(size=(2, 1000)), ax=ax, agg='categorical', categories=categories,
+                                   dpi=100)
+    rgba = image.get_array()
+    assert rgba.shape[:2] == small.shape and np.all(rgba[..., :3] <= 1)
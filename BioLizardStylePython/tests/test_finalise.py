@@ -0,0 +1,424 @@
+import io
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from PIL import Image
+from BioLizardStylePython import *
+from BioLizardStylePython.utils import _figure_to_image
+from BioLizardStylePython.footer import _logo_box
+
+
+def _example_figure():
+    lizard_style()
+    fig, ax = plt.subplots()
+    ax.plot(np.arange(10), np.arange(10) ** 2, label='squares')
+    ax.set_title('A Lizard Plot')
+    ax.legend()
+    return fig
+
+
+def test_figure_to_image_matches_png():
+    fig = _example_figure()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150)
+    expected = np.asarray(Image.open(buf))
+    canvas = fig.canvas
+    result = np.asarray(_figure_to_image(fig, 150))
+    assert fig.canvas is canvas
+    assert np.array_equal(result, expected)
+    plt.close(fig)
+
+
+def test_finalise_lizardplot_png(tmp_path):
+    fig = _example_figure()
+    finalise_lizardplot(fig, "Source: BioLizard", save_filepath=str(tmp_path / 'plot.png'))
+    img = Image.open(tmp_path / 'plot.png')
+    assert img.mode == 'RGB'
+    assert img.size == (1920, 1440 + 120)
+    plt.close(fig)
+
+
+def test_finalise_lizardplot_vector_pdf(tmp_path):
+    fig = _example_figure()
+    finalise_lizardplot(fig, "Source: BioLizard", pdf=True, output_name=str(tmp_path / 'raster'))
+    finalise_lizardplot(fig, "Source: BioLizard", pdf=True, vector=True, output_name=str(tmp_path / 'vector'))
+    assert (tmp_path / 'vector.pdf').read_bytes().startswith(b'%PDF')
+    assert (tmp_path / 'vector.pdf').stat().st_size < (tmp_path / 'raster.pdf').stat().st_size
+    assert len(fig.axes) == 1  # footer axes are removed again
+    plt.close(fig)
+
+
+def test_finalise_lizardplot_vector_matches_raster_layout(tmp_path):
+    fig = _example_figure()
+    finalise_lizardplot(fig, "Source: BioLizard", save_filepath=str(tmp_path / 'raster.png'))
+    finalise_lizardplot(fig, "Source: BioLizard", vector=True, save_filepath=str(tmp_path / 'vector.png'))
+    raster = np.asarray(Image.open(tmp_path / 'raster.png').convert('RGB'), dtype=int)
+    vector = np.asarray(Image.open(tmp_path / 'vector.png').convert('RGB'), dtype=int)
+    assert raster.shape == vector.shape
+    assert np.abs(raster - vector).mean() < 1
+    plt.close(fig)
+
+
+def test_finalise_lizardplots_batch(tmp_path):
+    figs = [_example_figure() for _ in range(3)]
+    plots = figs + [str(tmp_path / 'missing.pickle')]
+    results = finalise_lizardplots(plots, "Source: BioLizard", output_dir=str(tmp_path), max_workers=2)
+    assert [r['index'] for r in results] == [0, 1, 2, 3]
+    assert all(r['error'] is None for r in results[:3])
+    assert 'FileNotFoundError' in results[3]['error']
+    assert sorted(str(p) for p in tmp_path.iterdir()) == sorted(r['filename'] for r in results[:3])
+    assert Image.open(results[0]['filename']).size == (1920, 1560)
+    again = finalise_lizardplots(figs, "Source: BioLizard", output_dir=str(tmp_path), max_workers=1)
+    assert not {r['filename'] for r in again} & {r['filename'] for r in results}
+    (tmp_path / 'threads').mkdir()
+    results = finalise_lizardplots(figs, "Source: BioLizard", output_dir=str(tmp_path / 'threads'),
+                                   output_names=['a', 'b', 'c'], use_threads=True)
+    assert all(r['error'] is None for r in results)
+    assert sorted(p.name for p in (tmp_path / 'threads').iterdir()) == ['a.png', 'b.png', 'c.png']
+    for fig in figs:
+        plt.close(fig)
+
+
+def test_footer_cache(tmp_path):
+    set_footer_cache(maxsize=4, cache_dir=str(tmp_path / 'footers'))
+    try:
+        fig = _example_figure()
+        finalise_lizardplot(fig, "Source: cached", save_filepath=str(tmp_path / 'a.png'))
+        finalise_lizardplot(fig, "Source: cached", save_filepath=str(tmp_path / 'b.png'))
+        info = footer_cache_info()
+        assert (info['hits'], info['misses'], info['currsize']) == (1, 1, 1)
+        assert (tmp_path / 'a.png').read_bytes() == (tmp_path / 'b.png').read_bytes()
+
+        clear_footer_cache()
+        disk = footer_image(1920, "Source: cached")
+        assert footer_cache_info()['disk_hits'] == 1
+        set_footer_cache(maxsize=4)
+        assert np.array_equal(np.asarray(disk), np.asarray(footer_image(1920, "Source: cached")))
+        plt.close(fig)
+    finally:
+        set_footer_cache()
+
+
+def test_logo_is_pasted_where_imshow_draws_it():
+    fig = plt.figure(figsize=(1920 / 300, 0.4))
+    ax_image = fig.add_axes([0.90, -0.09, 0.10, 1], anchor='NE')
+    ax_image.imshow(get_logo().array)
+    ax_image.axis('off')
+    expected = np.asarray(_figure_to_image(fig, 300).convert('RGB'), dtype=int)
+    plt.close(fig)
+    logo = get_logo()
+    left, top, width, height = _logo_box(1920, 120, logo.aspect)
+    result = Image.new('RGBA', (1920, 120), 'white')
+    result.alpha_composite(logo.resized((width, height)), dest=(left, top))
+    result = np.asarray(result.convert('RGB'), dtype=int)
+    assert np.abs(result - expected).mean() < 0.5
+
+
+def test_svg_logo_stays_vector_in_svg_output(tmp_path):
+    logo = tmp_path / 'logo.svg'
+    logo.write_text('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 200 100">'
+                    '<rect width="200" height="100" fill="#01a086"/></svg>')
+    set_logo(str(logo))
+    try:
+        fig = _example_figure()
+        finalise_lizardplot(fig, "Source: BioLizard", vector=True, save_filepath=str(tmp_path / 'plot.svg'))
+        svg = (tmp_path / 'plot.svg').read_text()
+        assert 'data:image/svg+xml;base64,' in svg
+        assert 'data:image/png' not in svg
+        plt.close(fig)
+    finally:
+        set_logo()
+
+
+def test_finalise_lizardplot_in_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fig = _example_figure()
+    png = finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes')
+    assert png.startswith(b'\x89PNG')
+    img = finalise_lizardplot(fig, "Source: BioLizard", return_as='image')
+    arr = finalise_lizardplot(fig, "Source: BioLizard", return_as='array')
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(png))), arr)
+    assert img.size == (arr.shape[1], arr.shape[0])
+    pdf = finalise_lizardplot(fig, "Source: BioLizard", pdf=True, vector=True, return_as='bytes')
+    assert pdf.startswith(b'%PDF')
+    assert list(tmp_path.iterdir()) == []
+
+    buf = io.BytesIO()
+    finalise_lizardplot(fig, "Source: BioLizard", save_filepath=buf)
+    assert buf.getvalue() == png
+    plt.close(fig)
+
+
+def test_low_memory_png_matches(tmp_path):
+    fig = _example_figure()
+    expected = finalise_lizardplot(fig, "Source: BioLizard", return_as='array')
+    with track_peak_memory() as memory:
+        png = finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', low_memory=True)
+    assert np.array_equal(np.asarray(Image.open(io.BytesIO(png))), expected)
+    assert memory['peak_rss_bytes'] > 0
+    finalise_lizardplot(fig, "Source: BioLizard", save_filepath=str(tmp_path / 'plot.png'), low_memory=True)
+    assert np.array_equal(np.asarray(Image.open(tmp_path / 'plot.png')), expected)
+    with pytest.raises(ValueError):
+        finalise_lizardplot(fig, "Source: BioLizard", pdf=True, low_memory=True)
+    plt.close(fig)
+
+
+def test_track_peak_memory_without_procfs(monkeypatch):
+    import sys
+    from BioLizardStylePython import utils
+
+    def no_procfs(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(utils, 'open', no_procfs, raising=False)
+    assert utils._read_rss('VmRSS') is None
+    with track_peak_memory() as memory:  # e.g. macOS: peak of the whole process
+        pass
+    assert memory['peak_rss_bytes'] > 0 and memory['peak_increase_bytes'] is None
+    monkeypatch.setitem(sys.modules, 'resource', None)  # e.g. Windows: not measured
+    with track_peak_memory() as memory:
+        pass
+    assert memory == {'start_rss_bytes': None, 'peak_rss_bytes': None, 'peak_increase_bytes': None}
+
+
+def _threaded_figure(index):
+    fig = Figure(figsize=(4, 3))
+    ax = fig.add_subplot()
+    ax.plot(np.arange(20), np.sin(np.arange(20) / (index + 1)))
+    ax.set_title(f'Plot {index}')
+    return fig
+
+
+def test_concurrent_finalisation_matches_serial():
+    lizard_style()
+    sources = [f"Source: BioLizard {index % 3}" for index in range(12)]
+    expected = [finalise_lizardplot(_threaded_figure(i), sources[i], return_as='array') for i in range(12)]
+    clear_footer_cache()
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda i: finalise_lizardplot(_threaded_figure(i), sources[i], return_as='array'),
+                                range(12)))
+    for result, reference in zip(results, expected):
+        assert np.array_equal(result, reference)
+
+
+def test_finalise_lizardplot_async():
+    lizard_style()
+    open_figures = plt.get_fignums()
+    expected = finalise_lizardplot(_threaded_figure(0), "Source: BioLizard", return_as='bytes')
+
+    async def render_all():
+        set_async_workers(3)
+        return await asyncio.gather(*[finalise_lizardplot_async(_threaded_figure(0), "Source: BioLizard",
+                                                                return_as='bytes') for _ in range(8)])
+
+    assert all(png == expected for png in asyncio.run(render_all()))
+    assert plt.get_fignums() == open_figures
+
+
+def test_finalise_lizardplot_mixed_rasterises_dense_layers(tmp_path):
+    fig = _example_figure()
+    rng = np.random.default_rng(0)
+    dense = fig.axes[0].scatter(*rng.normal(size=(2, 50000)), s=1, label='dense')
+    fig.axes[0].scatter([1, 2], [3, 4], label='sparse')
+    vector = finalise_lizardplot(fig, "Source: BioLizard", pdf=True, vector=True, return_as='bytes')
+    report = finalise_lizardplot_mixed(fig, "Source: BioLizard", rasterize_above=1000,
+                                       save_filepath=str(tmp_path / 'mixed.pdf'))
+    assert report['format'] == 'pdf'
+    assert report['file_size_bytes'] == (tmp_path / 'mixed.pdf').stat().st_size < len(vector) / 4
+    rows = {row['label']: row for row in report['artists']}
+    assert (rows['dense']['elements'], rows['dense']['rasterized']) == (50000, True)
+    assert (rows['sparse']['elements'], rows['sparse']['rasterized']) == (2, False)
+    assert not dense.get_rasterized() and len(fig.axes) == 1
+    low = finalise_lizardplot_mixed(fig, "Source: BioLizard", rasterize_above=1000, dpi=72, save_filepath=io.BytesIO())
+    assert low['file_size_bytes'] < report['file_size_bytes']
+    with pytest.raises(ValueError):
+        finalise_lizardplot(fig, "Source: BioLizard", rasterize_above=1000)
+    plt.close(fig)
+
+
+def test_finalise_lizardplot_encoding_options(tmp_path):
+    lizard_style()
+    fig, ax = plt.subplots()
+    ax.bar(list('abcd'), [1, 2, 3, 4], color=biolizard_qualitative_pal.colors[:4])
+    reference = finalise_lizardplot(fig, "Source: BioLizard", return_as='array')
+    indexed = Image.open(io.BytesIO(finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', palette_colors=256)))
+    assert indexed.mode == 'P'
+    decoded = np.asarray(indexed.convert('RGB'))
+    for color in biolizard_qualitative_pal.colors[:4]:  # palette colors stay exact
+        rgb = np.round(np.asarray(matplotlib.colors.to_rgb(color)) * 255)
+        bar = (reference == rgb).all(axis=-1)
+        assert bar.sum() > 1000 and (decoded[bar] == rgb).all()
+    assert np.abs(decoded.astype(int) - reference).mean() < 0.5
+    fast = finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', compress_level=1)
+    small = finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', compress_level=9, optimize=True)
+    assert len(small) < len(fast)
+    finalise_lizardplot(fig, "Source: BioLizard", image_format='webp', output_name=str(tmp_path / 'plot'))
+    assert np.array_equal(np.asarray(Image.open(tmp_path / 'plot.webp').convert('RGB')), reference)
+    with pytest.raises(ValueError):
+        finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', image_format='webp', palette_colors=256)
+    with pytest.raises(ValueError):
+        finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', image_format='gif')
+    for colors in (0, 257):  # checked before rendering
+        with pytest.raises(ValueError, match='between 1 and 256'):
+            finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', palette_colors=colors)
+        with pytest.raises(ValueError, match='between 1 and 256'):
+            finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', variants={'web': {'palette_colors': colors}})
+    plt.close(fig)
+
+
+def test_finalise_lizardplot_variants_from_one_render(tmp_path):
+    fig = _example_figure()
+    variants = {'thumbnail': {'width': 240, 'image_format': 'webp'}, 'preview': {'scale': 0.5}, 'print': {}}
+    finalise_lizardplot(fig, "Source: BioLizard", output_name=str(tmp_path / 'plot'), variants=variants)
+    assert Image.open(tmp_path / 'plot_thumbnail.webp').size == (240, 195)
+    assert Image.open(tmp_path / 'plot_preview.png').size == (960, 780)
+    full = finalise_lizardplot(fig, "Source: BioLizard", return_as='array')
+    assert np.array_equal(np.asarray(Image.open(tmp_path / 'plot_print.png')), full)
+    images = finalise_lizardplot(fig, "Source: BioLizard", return_as='image', variants=variants)
+    assert {name: image.size for name, image in images.items()} == {
+        'thumbnail': (240, 195), 'preview': (960, 780), 'print': (1920, 1560)}
+    with pytest.raises(ValueError):
+        finalise_lizardplot(fig, "Source: BioLizard", pdf=True, variants=variants)
+    with pytest.raises(ValueError):
+        finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', variants={'small': {'height': 10}})
+    plt.close(fig)
+
+
+def test_preview_lizardplot_defers_full_render(tmp_path):
+    fig = _example_figure()
+    preview = preview_lizardplot(fig, "Source: BioLizard", save_filepath=str(tmp_path / 'final.png'))
+    assert preview.image.size == (640, 520)
+    assert preview._repr_png_().startswith(b'\x89PNG')
+    assert not (tmp_path / 'final.png').exists()
+    fig.axes[0].set_title('Edited')
+    preview.refresh()
+    preview.finalise()
+    final = np.asarray(Image.open(tmp_path / 'final.png'))
+    assert np.array_equal(final, finalise_lizardplot(fig, "Source: BioLizard", return_as='array'))
+    # same layout: the full render downscaled matches the preview closely
+    small = np.asarray(Image.fromarray(final).resize(preview.image.size, Image.Resampling.BOX), dtype=int)
+    assert np.abs(small - np.asarray(preview.image, dtype=int)).mean() < 6
+    assert preview.finalise(return_as='image', dpi=150).size == (960, 780)
+    # dpi is an argument of the final output, the preview has its own resolution
+    preview = preview_lizardplot(fig, "Source: BioLizard", preview_dpi=50, dpi=150, return_as='image')
+    assert preview.image.size == (320, 260)
+    assert preview.finalise().size == (960, 780)
+    plt.close(fig)
+
+
+def test_pdf_report_shares_logo_and_fonts(tmp_path):
+    path = tmp_path / 'report.pdf'
+    with LizardPdfReport(path, source_text="Source: BioLizard") as report:
+        for i in range(5):
+            fig = _example_figure()
+            entry = report.add(fig, source_text=f"Source: page {i}" if i else None)
+            assert entry['page'] == i + 1 and entry['seconds'] > 0
+            assert not plt.fignum_exists(fig.number)
+        fig = _example_figure()
+        with pytest.raises(ValueError), LizardPdfReport(io.BytesIO()) as empty:
+            empty.add(fig)
+        plt.close(fig)
+    data = path.read_bytes()
+    assert len(report.pages) == 5
+    assert data.count(b'/Type /Page ') == 5
+    assert data.count(b'/Subtype /Image') == 1
+    fig = _example_figure()
+    single = finalise_lizardplot(fig, "Source: BioLizard", pdf=True, vector=True, return_as='bytes')
+    assert data.count(b'/Type /Font') == single.count(b'/Type /Font')
+    plt.close(fig)
+
+
+def test_pdf_report_without_procfs(monkeypatch):
+    from BioLizardStylePython import utils
+
+    def no_procfs(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(utils, 'open', no_procfs, raising=False)  # e.g. macOS and Windows
+    buf = io.BytesIO()
+    with LizardPdfReport(buf, source_text="Source: BioLizard") as report:
+        entry = report.add(_example_figure())
+    assert entry['rss_bytes'] is None and entry['seconds'] > 0
+    assert buf.getvalue().startswith(b'%PDF')
+
+
+def _has_cairosvg():
+    try:
+        import cairosvg  # noqa: F401, also needs the system cairo library
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+@pytest.mark.skipif(not _has_cairosvg(), reason="cairosvg (optional 'svg' extra) is not available")
+def test_svg_logo_is_rasterised_for_bitmap_output(tmp_path):
+    logo = tmp_path / 'logo.svg'
+    logo.write_text('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 200 100">'
+                    '<rect width="200" height="100" fill="#01a086"/></svg>')
+    set_logo(str(logo))
+    try:
+        assets = get_logo()
+        assert assets.image.mode == 'RGBA' and assets.image.width == 2000
+        assert assets.image.width / assets.image.height == pytest.approx(2, rel=0.01)
+        resized = assets.resized((120, 60))
+        assert resized.size == (120, 60) and assets.resized((120, 60)) is resized
+        assert np.allclose(np.asarray(resized)[30, 60], (1, 160, 134, 255), atol=2)
+        fig = _example_figure()
+        finalise_lizardplot(fig, "Source: BioLizard", save_filepath=str(tmp_path / 'plot.png'))
+        result = Image.open(tmp_path / 'plot.png').convert('RGB')
+        left, top, width, height = _logo_box(result.width, 120, assets.aspect)
+        footer = np.asarray(result)[-120:]
+        assert np.allclose(footer[top + height // 2, left + width // 2], (1, 160, 134), atol=2)
+        plt.close(fig)
+    finally:
+        set_logo()
+
+
+def test_saved_file_and_returned_bytes_are_one_encoding(tmp_path, monkeypatch):
+    from BioLizardStylePython import utils
+    fig = _example_figure()
+    webp = finalise_lizardplot(fig, "Source: BioLizard", save_filepath=str(tmp_path / 'plot.webp'), return_as='bytes')
+    assert webp == (tmp_path / 'plot.webp').read_bytes()
+    assert Image.open(io.BytesIO(webp)).format == 'WEBP'
+
+    renders = []
+    save_vector = utils._save_vector
+    monkeypatch.setattr(utils, '_save_vector', lambda *args, **kwargs: renders.append(args) or save_vector(*args, **kwargs))
+    svg = finalise_lizardplot(fig, "Source: BioLizard", pdf=True, save_filepath=str(tmp_path / 'plot.svg'), vector=True,
+                              return_as='bytes')
+    assert len(renders) == 1
+    assert svg == (tmp_path / 'plot.svg').read_bytes() and b'<svg' in svg
+    plt.close(fig)
+
+
+def test_variants_inherit_encoding_options(tmp_path):
+    fig = _example_figure()
+    variants = {'thumbnail': {'width': 240}, 'lossy': {'scale': 0.5, 'quality': 50}, 'indexed': {'image_format': 'png'}}
+    finalise_lizardplot(fig, "Source: BioLizard", save_filepath=str(tmp_path / 'plot.webp'), quality=90,
+                        variants=variants)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['plot_indexed.png', 'plot_lossy.webp',
+                                                                'plot_thumbnail.webp']
+    data = finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', palette_colors=64,
+                               variants={'small': {'width': 240}, 'full': {'palette_colors': None}})
+    assert Image.open(io.BytesIO(data['small'])).mode == 'P'
+    assert Image.open(io.BytesIO(data['full'])).mode == 'P'
+    with pytest.raises(ValueError):
+        finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', variants={'small': {'width': 240, 'scale': 0.5}})
+    with pytest.raises(ValueError):
+        finalise_lizardplot(fig, "Source: BioLizard", return_as='bytes', palette_colors=64,
+                            variants={'web': {'image_format': 'webp'}})
+    plt.close(fig)
+
+
+def test_footer_uses_the_logo_of_its_cache_key(tmp_path):
+    from BioLizardStylePython.footer import _render_footer
+    path = tmp_path / 'red.png'
+    Image.new('RGB', (200, 100), (255, 0, 0)).save(path)
+    img = _render_footer(1920, "Source: BioLizard", 12, 300, None, str(path))
+    left, top, width, height = _logo_box(img.width, img.height, 2)
+    assert img.getpixel((left + width // 2, top + height // 2)) == (255, 0, 0, 255)
+    assert get_logo().path != str(path)
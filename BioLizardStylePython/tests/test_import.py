@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+
+
+def _run(code, env=None):
+    return subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True,
+                          env=env).stdout.split()
+
+
+def test_import_does_not_load_plotly():
+    out = _run("import sys, BioLizardStylePython; print('plotly' in sys.modules)")
+    assert out == ['False']
+
+
+def test_template_loaded_on_access():
+    out = _run("import BioLizardStylePython as b; print(type(b.lizard_style_template).__name__)")
+    assert out == ['Template']
+
+
+def test_lizard_style_sets_plotly_default():
+    out = _run("import BioLizardStylePython as b; b.lizard_style(plotly=True); "
+               "import plotly.io as pio; print(pio.templates.default)")
+    assert out == ['lizard_style']
+
+
+def test_fonts_registered_once_per_environment(tmp_path):
+    env = dict(os.environ, MPLCONFIGDIR=str(tmp_path))
+    code = ("from matplotlib import font_manager; added = []; addfont = font_manager.FontManager.addfont; "
+            "font_manager.FontManager.addfont = lambda self, path: added.append(path) or addfont(self, path); "
+            "import sys, BioLizardStylePython as b; "
+            "print(len(added), b.lato_family(), 'fonts.ttf' in sys.modules)")
+    assert _run(code, env) == ['2', 'Lato', 'False']
+    assert _run(code, env) == ['0', 'Lato', 'False']
+
+
+def test_import_builds_no_palette(tmp_path):
+    env = dict(os.environ, MPLCONFIGDIR=str(tmp_path))
+    out = _run("import sys, BioLizardStylePython; from BioLizardStylePython import _palettes; "
+               "print(_palettes.palette.cache_info().currsize, 'colorspace' in sys.modules)", env)
+    assert out == ['0', 'False']
+
+
+def test_template_needs_no_colorscale_search(tmp_path):
+    env = dict(os.environ, MPLCONFIGDIR=str(tmp_path))  # fresh container: empty cache
+    out = _run("import BioLizardStylePython as b; from BioLizardStylePython import _palettes; "
+               "_palettes.compact_stops = None; b.lizard_style(plotly=True); "
+               "import plotly.io as pio; print(len(pio.templates['lizard_style'].layout.colorscale.sequential))", env)
+    assert out == ['7']
+
+
+def test_star_import_exports_no_helper_modules():
+    out = _run("import types; ns = {}; exec('from BioLizardStylePython import *', ns); "
+               "print(*sorted(k for k, v in ns.items() if isinstance(v, types.ModuleType) "
+               "and not v.__name__.startswith('BioLizardStylePython')))")
+    assert out == ['Image', 'io', 'matplotlib', 'mpl', 'os', 'plt']  # as exported by v2.0.1
+
+
+def test_plotly_import_is_not_hooked():
+    out = _run("import sys, BioLizardStylePython; "
+               "print(any(type(f).__module__.startswith('BioLizardStylePython') for f in sys.meta_path)); "
+               "import plotly.io as pio; print('lizard_style' in pio.templates)")
+    assert out == ['False', 'False']
+
+
+def test_star_import_registers_template():
+    out = _run("from BioLizardStylePython import *; import plotly.io as pio; "
+               "print(type(lizard_style_template).__name__, 'lizard_style' in pio.templates)")
+    assert out == ['Template', 'True']
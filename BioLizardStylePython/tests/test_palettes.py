@@ -1,5 +1,8 @@
 import unittest
+import numpy as np
+import matplotlib.colors
 from BioLizardStylePython import *
+from BioLizardStylePython import _palettes
 # from matplotlib.colors import rgb_to_hsv, to_rgb
 
 class PalettesTestCase(unittest.TestCase):
@@ -24,6 +27,101 @@ class PalettesTestCase(unittest.TestCase):
         self.assertEqual(cols, ['#01A086', '#1E2237', '#E9B940'],
                          "First three colors of qualitative palette do not match BLZ colors")
     
+    def test_hcl_cache_matches_colorspace(self):
+        built = _palettes._build_hcl_tables()
+        cached = _palettes.hcl_tables()
+        for name, table in built.items():
+            self.assertTrue(np.array_equal(cached[name], table),
+                            f"Cached {name} table differs from colorspace output")
+
+    def test_vectorized_hex_matches_matplotlib(self):
+        rgba = l_viridis_pal(np.arange(256))
+        self.assertEqual(_palettes.to_hex(rgba), [matplotlib.colors.rgb2hex(c) for c in rgba])
+
+    def test_colorscale_is_shared(self):
+        pal = _palettes.palette('l_viridis_pal')
+        self.assertIs(pal.colorscale(), pal.colorscale())
+        self.assertEqual(len(pal.colorscale()), 255)
+        self.assertEqual(pal.colorscale(reverse=True)[0], matplotlib.colors.rgb2hex(l_viridis_pal_r(0)))
+
+    def test_lazy_colormaps_match_palettes(self):
+        for name in ['biolizard_hues_pal', 'biolizard_sequential_pal', 'biolizard_divergent_pal', 'l_viridis_pal']:
+            for reverse in (False, True):
+                lazy = _palettes.lazy_colormap(name, reverse)
+                self.assertIsInstance(lazy, matplotlib.colors.LinearSegmentedColormap)
+                eager = _palettes.palette(name).colormap_r if reverse else _palettes.palette(name).colormap
+                self.assertEqual(lazy.name, eager.name)
+                self.assertTrue(np.array_equal(lazy(np.arange(256)), eager(np.arange(256))))
+
+    def test_registered_colormaps_resolve_by_name(self):
+        for name in ['biolizard_sequential_pal', 'l_viridis_pal_r']:
+            self.assertEqual(matplotlib.colormaps[name], _palettes.lazy_colormap(name.removesuffix('_r'),
+                                                                                  name.endswith('_r')))
+
+    def test_compact_colorscale_within_tolerance(self):
+        x = np.linspace(0, 1, 2001)
+        for name, reverse in [('l_viridis_pal', False), ('l_viridis_pal', True), ('biolizard_divergent_pal', False)]:
+            pal = _palettes.palette(name)
+            dense = (pal.colormap_r if reverse else pal.colormap)(np.arange(255))[:, :3]
+            expected = np.stack([np.interp(x, np.linspace(0, 1, 255), dense[:, i]) for i in range(3)], axis=-1)
+            compact = pal.colorscale(reverse=reverse, delta_e=1.0)
+            self.assertLess(len(compact), 20)
+            self.assertEqual((compact[0][0], compact[-1][0]), (0.0, 1.0))
+            self.assertEqual(compact[0][1], pal.colorscale(reverse=reverse)[0])
+            positions = [position for position, _ in compact]
+            stops = matplotlib.colors.to_rgba_array([color for _, color in compact])[:, :3]
+            result = np.stack([np.interp(x, positions, stops[:, i]) for i in range(3)], axis=-1)
+            delta_e = np.linalg.norm(_palettes._srgb_to_lab(result) - _palettes._srgb_to_lab(expected), axis=-1)
+            self.assertLessEqual(delta_e.max(), 1.0 + 1e-3)
+
+    def test_precomputed_compact_stops(self):
+        for (name, reverse, n, delta_e), stops in _palettes._COMPACT_STOPS.items():
+            pal = _palettes.palette(name)
+            colors = (pal.colormap_r if reverse else pal.colormap)(np.arange(n))
+            self.assertEqual(tuple(_palettes.compact_stops(colors, delta_e)), stops, (name, reverse))
+
+    def test_template_colorscale_tolerance(self):
+        from BioLizardStylePython import plotly_template
+        template = plotly_template.lizard_style_template
+        self.assertEqual(template.layout.colorscale.sequential, template.data.heatmap[0].colorscale)
+        self.assertLess(len(template.layout.colorscale.sequential), 20)
+        try:
+            plotly_template.set_colorscale_tolerance(None)
+            self.assertEqual(len(template.data.heatmap[0].colorscale), 255)
+            self.assertEqual(len(template.layout.colorscale.diverging), 255)
+        finally:
+            plotly_template.set_colorscale_tolerance()
+
+    def test_apply_colormap_matches_matplotlib(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(size=(300, 200)).astype(np.float32)
+        values[0, :3] = [np.nan, np.inf, -np.inf]
+        values[1, 0] = 2.0
+        integers = rng.integers(0, 4096, size=(300, 200)).astype(np.uint16)
+        for name in ['biolizard_sequential_pal', 'l_viridis_pal_r']:
+            cmap = matplotlib.colormaps[name]
+            for data, norm in [(values, matplotlib.colors.Normalize(-2, 2)), (integers, matplotlib.colors.Normalize(100, 4000))]:
+                expected = np.round(cmap(norm(data)) * 255).astype(np.uint8)
+                result = apply_colormap(data, name, vmin=norm.vmin, vmax=norm.vmax, chunk_size=1000)
+                self.assertEqual(result.dtype, np.uint8)
+                self.assertTrue(np.array_equal(result, expected))
+            log = matplotlib.colors.LogNorm(0.01, 3)
+            self.assertTrue(np.array_equal(apply_colormap(np.abs(values), cmap, norm=log),
+                                           np.round(cmap(log(np.abs(values))) * 255).astype(np.uint8)))
+        self.assertEqual(tuple(apply_colormap(values)[0, 0]), (0, 0, 0, 0))  # NaN is transparent
+
+    def test_apply_colormap_out_and_range(self):
+        data = np.ma.masked_equal(np.arange(12.0).reshape(3, 4), 5)
+        out = np.zeros((3, 4, 4), dtype=np.uint8)
+        self.assertIs(apply_colormap(data, 'l_viridis_pal', out=out, chunk_size=4), out)
+        lut = colormap_lut('l_viridis_pal')
+        self.assertEqual(lut.shape, (259, 4))
+        self.assertTrue(np.array_equal(out[0, 0], lut[0]))
+        self.assertTrue(np.array_equal(out[2, 3], lut[255]))
+        self.assertTrue(np.array_equal(out[1, 1], lut[-1]))  # masked values get the bad color
+        with self.assertRaises(ValueError):
+            apply_colormap(data, out=np.zeros((3, 4, 3), dtype=np.uint8))
+
     # def test_sequential_ncolors(self):
     #     cols = biolizard_sequential_pal
     #     self.assertEqual(len(cols), 11,
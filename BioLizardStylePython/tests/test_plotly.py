@@ -0,0 +1,90 @@
+import io
+import base64
+import numpy as np
+import pytest
+import matplotlib
+import plotly.graph_objects as go
+from PIL import Image
+from BioLizardStylePython import optimize_for_webgl, lttb, lizard_heatmap
+
+
+def _decode_image(source):
+    return np.asarray(Image.open(io.BytesIO(base64.b64decode(source.split(',', 1)[1]))).convert('RGBA'))
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.linspace(0, 10, 10000)
+    y = np.sin(x)
+    y[4321] = 10
+    keep = lttb(x, y, 500)
+    assert len(keep) == 500
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 4321 in keep
+    assert np.array_equal(lttb(x[:100], y[:100], 500), np.arange(100))
+
+
+def test_optimize_for_webgl():
+    n = 5000
+    x = np.arange(n)
+    fig = go.Figure([go.Scatter(x=x, y=np.cos(x / 100), text=x.astype(str), fillpattern={'shape': '/'}, name='line'),
+                     go.Scatter(x=x, y=np.cos(x), mode='markers', name='points'),
+                     go.Scatter(x=x, y=x, stackgroup='one', name='stacked'),
+                     go.Scatter(x=[0, 1], y=[0, 1], name='small')],
+                    layout={'template': 'lizard_style'})
+    optimize_for_webgl(fig, threshold=1000, max_points=200)
+    line, points, stacked, small = fig.data
+    assert (line.type, points.type, stacked.type, small.type) == ('scattergl', 'scattergl', 'scatter', 'scatter')
+    assert len(line.x) == len(line.y) == len(line.text) == 200
+    assert list(line.text[:2]) == [str(v) for v in line.x[:2]]
+    assert len(points.y) == n
+    assert [trace.name for trace in fig.data] == ['line', 'points', 'stacked', 'small']
+
+
+def test_lizard_heatmap():
+    z = np.arange(300 * 400, dtype=float).reshape(300, 400)
+    z[0, 0] = np.nan
+    fig = lizard_heatmap(z, x=np.linspace(0, 1, 400), colormap='biolizard_sequential_pal_r', hover_size=100)
+    image, hover, colorbar = fig.data
+    assert (image.type, hover.type, colorbar.type) == ('image', 'heatmap', 'scatter')
+    rgba = _decode_image(image.source)
+    assert rgba.shape == (300, 400, 4)
+    assert rgba[0, 0, 3] == 0
+    norm = matplotlib.colors.Normalize(np.nanmin(z), np.nanmax(z))
+    expected = np.round(matplotlib.colormaps['biolizard_sequential_pal_r'](norm(z)) * 255).astype(np.uint8)
+    assert np.array_equal(rgba[1:], expected[1:])
+    assert np.asarray(hover.z).shape == (100, 100)
+    assert (colorbar.marker.cmin, colorbar.marker.cmax) == (1, z.size - 1)
+    assert image.dx == 1 / 399
+
+    small = lizard_heatmap(z, max_image_size=100, image_format='webp')
+    assert _decode_image(small.data[0].source).shape == (100, 100, 4)
+    assert small.data[0].dx == 4 and small.data[0].x0 == 1.5
+    assert small.data[0].dy == 3 and small.data[0].y0 == 1
+
+
+def test_lizard_heatmap_reduces_axes_separately():
+    rng = np.random.default_rng(0)
+    z = rng.normal(size=(20000, 12))  # genes x samples
+    fig = lizard_heatmap(z, y=np.arange(20000) * 2.0, max_image_size=2048, hover_size=200)
+    image, hover, _ = fig.data
+    assert _decode_image(image.source).shape == (2000, 12, 4)
+    assert (image.dx, image.x0) == (1, 0) and (image.dy, image.y0) == (20, 9)
+    hover_z = np.asarray(hover.z)
+    assert hover_z.shape == (200, 12)
+    assert np.allclose(hover_z[:, 3], z[:, 3].reshape(200, 100).mean(axis=1), atol=1e-5)
+    assert (hover.dx, hover.dy) == (1, 200)
+
+
+def test_lttb_rejects_invalid_input():
+    x = np.arange(100.0)
+    with pytest.raises(ValueError):
+        lttb(x, np.sin(x), 2)
+    y = np.sin(x)
+    y[10] = np.nan
+    with pytest.raises(ValueError):
+        lttb(x, y, 20)
+    fig = go.Figure(go.Scatter(x=x, y=y))
+    assert len(optimize_for_webgl(fig, threshold=50, max_points=20).data[0].y) == 100
+    with pytest.raises(ValueError):
+        optimize_for_webgl(fig, max_points=2)
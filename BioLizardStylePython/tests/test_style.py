@@ -0,0 +1,80 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import BioLizardStylePython
+from BioLizardStylePython import *
+
+STYLE_PATH = os.path.join(os.path.dirname(BioLizardStylePython.__file__), 'lizard_style.mplstyle')
+
+
+def _styled_figure(index=0):
+    fig = Figure(figsize=(4, 3))
+    ax = fig.add_subplot()
+    ax.plot(np.arange(10), np.arange(10) * (index + 1))
+    ax.set_title(f'Plot {index}')
+    return fig
+
+
+def test_style_params_parsed_once():
+    assert lizard_style_params() is lizard_style_params()
+    expected = matplotlib.rc_params_from_file(STYLE_PATH, use_default_template=False)
+    assert dict(lizard_style_params()) == dict(expected)
+
+
+def test_lizard_style_matches_style_file():
+    with matplotlib.rc_context():
+        plt.style.use(STYLE_PATH)
+        expected = dict(matplotlib.rcParams)
+    with matplotlib.rc_context():
+        lizard_style()
+        assert dict(matplotlib.rcParams) == expected
+
+
+def test_style_context_restores_settings():
+    with matplotlib.rc_context():
+        matplotlib.rcdefaults()
+        before = dict(matplotlib.rcParams)
+        with lizard_style_context():
+            assert matplotlib.rcParams['font.sans-serif'] == ['Lato']
+            fig = _styled_figure()
+            with lizard_style_context():
+                pass
+            assert matplotlib.rcParams['font.sans-serif'] == ['Lato']
+        assert dict(matplotlib.rcParams) == before
+        assert fig.axes[0].title.get_text() == '' and fig.axes[0]._left_title.get_text() == 'Plot 0'
+
+
+def test_style_context_failing_plotly_import_changes_nothing(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'plotly.io', None)  # import fails
+    with matplotlib.rc_context():
+        matplotlib.rcdefaults()
+        before = dict(matplotlib.rcParams)
+        with pytest.raises(ImportError):
+            with lizard_style_context(plotly=True):
+                pass
+        assert dict(matplotlib.rcParams) == before
+        with lizard_style_context():
+            assert matplotlib.rcParams['font.sans-serif'] == ['Lato']
+        assert dict(matplotlib.rcParams) == before
+
+
+def test_style_context_concurrent_jobs():
+    with matplotlib.rc_context():
+        lizard_style()
+        expected = [finalise_lizardplot(_styled_figure(i), "Source: BioLizard", return_as='array') for i in range(6)]
+        matplotlib.rcdefaults()
+        before = dict(matplotlib.rcParams)
+
+        def job(index):
+            with lizard_style_context():
+                return finalise_lizardplot(_styled_figure(index), "Source: BioLizard", return_as='array')
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(job, range(6)))
+        assert all(np.array_equal(result, reference) for result, reference in zip(results, expected))
+        assert dict(matplotlib.rcParams) == before